@@ -14,14 +14,22 @@
 #
 # Copyright (c) 2017 Stanislav Vinokurov, All rights reserved.
 #
+import os
 import re
 import sys
 import math
+import heapq
+import json
 import time
 import pytz
 import logging
+import bisect
+import locale
+import sqlite3
+import asyncio
 import argparse
 import datetime
+import itertools
 import traceback
 
 from tzlocal import get_localzone
@@ -29,6 +37,8 @@ from ib_insync import *
 
 version = '4.20'
 
+TRADE_LOG_HEADER = 'Symbol, Description, Action, Quantity, Price, Commission, Reg Fees, Date, TransactionID, Order Number, Transaction Type ID, Total Cost\n'
+
 def InitLogging():      
     if args.logLevel > 0:
         logging.basicConfig(level=args.logLevel, filename='TradeLogIB.log', filemode='w+', format='%(asctime)s: %(threadName)-10s: %(message)s', )
@@ -45,15 +55,64 @@ def InitLogging():
     ch.setLevel(args.consoleLogLevel)
     root.addHandler(ch)
 
-def AsTimeZone(dt, src_timezone, dst_timezone):
-        #
-        # NOTE: dt is already localized, so we do not need to call src_timezone.localize(dt) here,
-        #       and we use directly dt as is.
-        #
-        return src_timezone.normalize(dt).astimezone(dst_timezone)
+def SetLocale():
+    #
+    # Trade log dates are written in US format. 'american' is the name of the locale on Windows, try the POSIX names
+    # on other systems (C.UTF-8 formats dates the same way).
+    #
+    for name in ['american', 'en_US.UTF-8', 'C.UTF-8']:
+        try:
+            return locale.setlocale(locale.LC_ALL, name)
+        except locale.Error:
+            pass
+
+    logging.warning('Warning: unable to set US locale, using the default one')
+
+def ZoneOffset(epoch):
+    #
+    # Returns the UTC offset (in seconds) of the local time zone at the given time, as looked up in pytz.
+    #
+    dt = datetime.datetime.fromtimestamp(epoch, pytz.utc).astimezone(dst_timezone)
+    return int(dt.utcoffset().total_seconds())
+
+def UtcOffset(epoch):
+    #
+    # Returns the UTC offset (in seconds) of the local time zone at the given time. The offset is looked up in pytz once
+    # per hour of UTC time and then taken from utc_offsets. Zones like Australia/Adelaide or America/St_Johns switch DST
+    # on the half hour of UTC time, so an hour with a switch in it is marked with False in utc_offsets and the times in
+    # it are looked up one by one.
+    #
+    hour   = epoch // 3600
+    offset = utc_offsets.get(hour)
+
+    if offset is None:
+        start  = ZoneOffset(hour * 3600)
+        offset = utc_offsets[hour] = start if start == ZoneOffset(hour * 3600 + 3599) else False
+
+    if offset is False:
+        offset = ZoneOffset(epoch)
+
+    return offset
+
+def FillTime(execution):
+    #
+    # Returns (epoch, date) tuple of the execution, where date is the time formatted for the trade log (in local time
+    # unless --UTC is given). The time is converted and formatted only once, when the execution first arrives.
+    #
+    exec_key = (execution.acctNumber, execution.execId)
+    entry    = fill_times.get(exec_key)
+
+    if entry is None:
+        epoch = int(execution.time.timestamp())
+        local = epoch if args.UTC else epoch + UtcOffset(epoch)
+        entry = fill_times[exec_key] = (epoch, time.strftime('%x %X', time.gmtime(local)))
+
+    return entry
+
+OX_SYMBOL_RE = re.compile(r'(.+)\s+(.+)')
 
 def ConverSymbol_IB2OX(symbol):
-    matchObj = re.match('(.+)\s+(.+)', symbol)
+    matchObj = OX_SYMBOL_RE.match(symbol)
 
     if not matchObj:
         return '!!!ERROR!!!'
@@ -63,133 +122,625 @@ def ConverSymbol_IB2OX(symbol):
 
     return ticker.ljust(6, '^') + opra_id 
 
+def FormatContract(contract):
+    #
+    # Returns (symbol, description) of the option contract. A session only has a few hundred distinct contracts,
+    # so they are formatted once, when the contract is first seen, and then taken from contract_cache by conId.
+    #
+    cache_key = contract.conId or contract.localSymbol
+    entry     = contract_cache.get(cache_key)
 
-ap = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-ap.add_argument('--host',            type=str,  default='127.0.0.1',      help='Host to connect to')
-ap.add_argument('--port',            type=int,  default=4001,             help='Port to connect to')
-ap.add_argument('--clientId',        type=int,  default=0,                help='Client Id')
-ap.add_argument('--daemon',                     default=False,            help='Turn on deamon mode', action='store_true')
-ap.add_argument('--UTC',                        default=False,            help='Store trades in UTC timezone, i.e. do not convert time to Local Time Zone)', action='store_true')
-ap.add_argument('--logLevel',        type=int,  default=0,                help='Log level for log file output (DEBUG=10, INFO=20, WARNING=30, ERROR: 40, CRITICAL: 50)')
-ap.add_argument('--consoleLogLevel', type=int,  default=30,               help='Log level for console output  (DEBUG=10, INFO=20, WARNING=30, ERROR: 40, CRITICAL: 50)')
-ap.add_argument('outputFile',        type=str,  default='TradeLogIB.csv', help='Output file', nargs='?')
-args = ap.parse_args()
+    if entry is not None:
+        return entry
 
-InitLogging()
-ib = None
+    symbol = ConverSymbol_IB2OX(contract.localSymbol)
 
-try:    
-    import locale
-    locale.setlocale(locale.LC_ALL, 'american')
+    if contract.right == 'C':
+        desc           = '{} {} {} Call'.format(contract.symbol, contract.lastTradeDateOrContractMonth, contract.strike)
+    elif contract.right == 'P':
+        desc           = '{} {} {} Put'.format(contract.symbol, contract.lastTradeDateOrContractMonth, contract.strike)
+    else:
+        logging.error('Error: unable to parse fill.contract.right "{}".\n'.format(contract.right))
+        sys.exit(1)
 
-    ib = IB()
-    ib.connect(host=args.host, port=args.port, clientId=args.clientId)
+    entry = contract_cache[cache_key] = (symbol, desc, int(contract.multiplier))
 
-    trades_map = {}
+    return entry
 
-    if args.daemon:
-        print('Entering daemon mode...')
+def FormatFills(fills):
+    #
+    # Returns a list of (key, line, fill) tuples for the given fills, skipping the fills that do not go to the trade log.
+    # The whole block of fills is formatted in one pass, contract fields come from FormatContract().
+    #
+    entries = []
 
-    src_timezone = pytz.utc
-    dst_timezone = get_localzone()
+    for fill in fills:
+        contract  = fill.contract
+        execution = fill.execution
 
-    last_processing_time = time.time()   
+        if contract.secType != 'OPT':
+            continue
 
-    while True:
-        if args.daemon and time.time() - last_processing_time > 60:
-            #
-            # Reconnect to TWS every 60 sec as a quick fix for ib_insync 'partial fills bug' which reappeared in ib_insync again.
-            #
-            last_processing_time = time.time()
-            ib.disconnect()
-            ib.connect(host=args.host, port=args.port, clientId=args.clientId)
+        epoch, date = FillTime(execution)
 
-        has_new_data = False
+        if execution.side == 'BOT':
+            action = 'Buy To Open'
+        elif execution.side == 'SLD':
+            action = 'Sell To Open'
+        else:
+            logging.error('Error: unable to parse fill.execution.side "{}".\n'.format(execution.side))
+            sys.exit(1)
 
-        for fill in ib.fills():
-            if fill.contract.secType != 'OPT':
-                continue
+        symbol, desc, multiplier = FormatContract(contract)
 
-            dt = fill.execution.time
+        qty            = int(execution.shares)
 
-            if not args.UTC:
-                dt = AsTimeZone(dt, src_timezone, dst_timezone)
+        req_fees       = 0.0
+        transaction_id = execution.permId
 
-            if fill.execution.side == 'BOT':
-                action = 'Buy To Open'
-            elif fill.execution.side == 'SLD':
-                action = 'Sell To Open'
-            else:
-                logging.error('Error: unable to parse fill.execution.side "{}".\n'.format(fill.execution.side))
-                sys.exit(1)
+        price = math.fabs(float(execution.price))
 
-            symbol = ConverSymbol_IB2OX(fill.contract.localSymbol)
+        if hasattr(fill, 'commissionReport'):
+            commission = fill.commissionReport.commission
+        else:
+            commission = 0
 
-            if fill.contract.right == 'C':
-                desc           = '{} {} {} Call'.format(fill.contract.symbol, fill.contract.lastTradeDateOrContractMonth, fill.contract.strike)
-            elif fill.contract.right == 'P':
-                desc           = '{} {} {} Put'.format(fill.contract.symbol, fill.contract.lastTradeDateOrContractMonth, fill.contract.strike)
-            else:
-                logging.error('Error: unable to parse fill.contract.right "{}".\n'.format(fill.contract.right))
-                sys.exit(1)
+            if not args.daemon:
+                logging.warning('Warning: skipping trade as commission detail are not available ({} {} {} {} {})'.format(symbol, desc, action, qty, price))
+
+            continue
+
+        total_cost     = qty * price * multiplier + commission + req_fees
+        #total_cost     = format(total_cost, '.6f')
+
+        #
+        # We want output to be sorted by date/time and order_id, so here we just add output line to trades_map map, and then dump output in a separate cycle.
+        #
+        # Fills are deduplicated by account and execId, as the same fill can be reported by several gateways. The orderId
+        # depends on the connection (manual orders bound on clientId 0 get negative ids, other clients see 0), so the key
+        # of the first report of an execution is kept in exec_keys and reused, together with its orderId.
+        #
+        exec_key = (execution.acctNumber, execution.execId)
+        key      = exec_keys.get(exec_key)
+
+        if key is None:
+            key = exec_keys[exec_key] = (epoch, execution.orderId, execution.acctNumber, execution.execId)
+
+        order_id = key[1]
+
+        #
+        # Symbol, Description, Action, Quantity, Price, Commission, Reg Fees, Date, TransactionID, Order Number, Transaction Type ID, Total Cost
+        #
+        # SPX^^^130921P01660000,SPX Sep13 1660 Put,Buy To Open,2,3.15,2.27,0.06,09.12.2013 10:31:15 PM,111111111,222222222,34,-632.33
+        #
+        line  = '{},{},{},{},{},{},{},{},{},{},34,{}\n'.format(symbol, desc, action, qty, price, commission, req_fees, date, transaction_id, order_id, total_cost)
+
+        entries.append((key, line, fill))
+
+    return entries
+
+def FormatFill(fill):
+    #
+    # Returns (key, line) tuple for the given fill, or None if the fill does not go to the trade log.
+    #
+    entries = FormatFills([fill])
 
-            qty            = int(fill.execution.shares)
-        
-            req_fees       = 0.0
-            transaction_id = fill.execution.permId
-            order_id       = fill.execution.orderId
+    return entries[0][:2] if entries else None
 
-            price = math.fabs(float(fill.execution.price))
+def ProcessFills(fills, save=True):
+    #
+    # Adds the given fills to trades_map (and trade_fills), returns a list of keys of the new or changed trade log lines.
+    # The keys of trades_map are kept in order in trade_keys: a new key is inserted at its place with bisect (nearly
+    # always at the end, fills arrive mostly in time order), so the trade log never has to be sorted as a whole.
+    #
+    changed_keys = []
 
-            if hasattr(fill, 'commissionReport'):
-                commission = fill.commissionReport.commission
+    if save and fill_store:
+        fill_store.Save(fills)
+
+    for key, line, fill in FormatFills(fills):
+        old_line = trades_map.get(key)
+
+        if old_line is None:
+            bisect.insort(trade_keys, key)
+
+        if old_line != line:
+            changed_keys.append(key)
+
+        trades_map[key]  = line
+        trade_fills[key] = fill
+
+    return changed_keys
+
+class FillStore:
+    #
+    # Persistent store of fills (execution, contract and commission report), keyed by account and execId, in SQLite database.
+    # It allows to restore the trade log on startup and to request from TWS only the executions after the last stored one
+    # of the accounts of a gateway. The accounts of each gateway are stored too, so they are known before connecting.
+    #
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS fills (acctNumber TEXT, execId TEXT, time REAL, contract TEXT, execution TEXT, commissionReport TEXT, PRIMARY KEY (acctNumber, execId))')
+        self.db.execute('CREATE INDEX IF NOT EXISTS fills_time ON fills (time)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS fills_account_time ON fills (acctNumber, time)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS gateways (gateway TEXT PRIMARY KEY, accounts TEXT)')
+
+    def Save(self, fills):
+        rows = []
+
+        for fill in fills:
+            execution = fill.execution.nonDefaults()
+            exec_time = execution.pop('time').timestamp()
+
+            rows.append((fill.execution.acctNumber, fill.execution.execId, exec_time, self.Dump(fill.contract.nonDefaults()), self.Dump(execution), self.Dump(fill.commissionReport.nonDefaults())))
+
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO fills VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def Load(self):
+        fills = []
+
+        for exec_time, contract, execution, commission_report in self.db.execute('SELECT time, contract, execution, commissionReport FROM fills ORDER BY time'):
+            dt = datetime.datetime.fromtimestamp(exec_time, datetime.timezone.utc)
+
+            fills.append(Fill(Contract.create(**json.loads(contract)), Execution(time=dt, **json.loads(execution)), CommissionReport(**json.loads(commission_report)), dt))
+
+        return fills
+
+    def Prune(self, before):
+        #
+        # Deletes the fills before the given time (datetime), so that the store only holds the fills that TWS reports too.
+        #
+        with self.db:
+            self.db.execute('DELETE FROM fills WHERE time < ?', (before.timestamp(),))
+
+    def LastTime(self, accounts):
+        #
+        # Returns the earliest of the last fill times of the given accounts, so that no fill of any of the accounts is
+        # missed, or None if an account has no fills stored yet.
+        #
+        last_times = [self.db.execute('SELECT MAX(time) FROM fills WHERE acctNumber = ?', (account,)).fetchone()[0] for account in accounts]
+
+        if not last_times or None in last_times:
+            return None
+
+        return datetime.datetime.fromtimestamp(min(last_times), datetime.timezone.utc)
+
+    def Accounts(self, gateway):
+        row = self.db.execute('SELECT accounts FROM gateways WHERE gateway = ?', (gateway,)).fetchone()
+
+        return row[0].split(',') if row and row[0] else []
+
+    def SaveAccounts(self, gateway, accounts):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO gateways VALUES (?, ?)', (gateway, ','.join(accounts)))
+
+    def Close(self):
+        self.db.close()
+
+    @staticmethod
+    def Dump(values):
+        return json.dumps(values, default=lambda obj: obj.dict() if isinstance(obj, Object) else str(obj))
+
+class TradeLogWriter:
+    #
+    # Incremental trade log writer. New lines are appended to the end of the output file as long as they sort after
+    # the last written line. A late fill (or an updated line) truncates the file at the byte offset of the first
+    # changed line and rewrites only the tail of the file from there.
+    #
+    def __init__(self, path):
+        self.path    = path
+        self.keys    = []    # keys of the written lines, in file order
+        self.offsets = []    # byte offset of each written line in the file
+        self.size    = 0     # byte offset of the end of the file
+
+    def Write(self, changed_keys):
+        changed_keys = sorted(set(changed_keys))
+        pos          = bisect.bisect_left(self.keys, changed_keys[0])
+
+        if not self.offsets:
+            out = open(self.path, 'wb')
+            out.write(self.Encode(TRADE_LOG_HEADER))
+            self.size = out.tell()
+        else:
+            out = open(self.path, 'r+b')
+
+        with out:
+            if pos < len(self.keys):
+                #
+                # Late fill, rewrite the file starting from the first changed line. Both the written keys and the changed
+                # keys are in order already, so they are merged rather than sorted.
+                #
+                tail_keys = [key for key, _ in itertools.groupby(heapq.merge(self.keys[pos:], changed_keys))]
+                offset    = self.offsets[pos]
+
+                del self.keys[pos:]
+                del self.offsets[pos:]
             else:
-                commission = 0
+                tail_keys = changed_keys
+                offset    = self.size
+
+            out.seek(offset)
+            out.truncate()
+
+            for key in tail_keys:
+                data = self.Encode(trades_map[key])
 
-                if not args.daemon:
-                    logging.warning('Warning: skipping trade as commission detail are not available ({} {} {} {} {})'.format(symbol, desc, action, qty, price))
-        
-                continue       
+                self.keys.append(key)
+                self.offsets.append(offset)
 
-            total_cost     = qty * price * int(fill.contract.multiplier) + commission + req_fees
-            #total_cost     = format(total_cost, '.6f')
+                out.write(data)
+                offset += len(data)
 
+            self.size = offset
+
+    @staticmethod
+    def Encode(line):
+        #
+        # Same bytes as text mode output would produce.
+        #
+        return line.replace('\n', os.linesep).encode(locale.getpreferredencoding(False))
+
+class TradeLogSink:
+    #
+    # The trade log CSV file, either rewritten as a whole on every update or written incrementally by TradeLogWriter.
+    #
+    def __init__(self, path, incremental):
+        self.path   = path
+        self.writer = TradeLogWriter(path) if incremental else None
+
+    def Write(self, changed_keys):
+        if self.writer:
+            self.writer.Write(changed_keys)
+        else:
+            with open(self.path, "w") as out:
+                out.write(TRADE_LOG_HEADER)
+
+                for key in trade_keys:
+                    out.write(trades_map[key])
+
+class JsonLinesSink:
+    #
+    # Stream of fills in JSON lines format, one object per new or changed fill. A changed fill (e.g. when its commission
+    # report arrives) is written again with the same execId, consumers should keep the last record of each execId.
+    #
+    def __init__(self, path):
+        self.path    = path
+        self.records = {}    # last written record of each key
+        self.out     = open(path, 'w')
+
+    def Write(self, changed_keys):
+        for key in sorted(changed_keys):
+            record = json.dumps(self.Record(trade_fills[key]))
+
+            if self.records.get(key) != record:
+                self.records[key] = record
+                self.out.write(record + '\n')
+
+        self.out.flush()
+
+    def Close(self):
+        self.out.close()
+
+    @staticmethod
+    def Record(fill):
+        contract   = fill.contract
+        execution  = fill.execution
+        symbol, desc, multiplier = FormatContract(contract)
+
+        return {
+            'execId':     execution.execId,
+            'time':       execution.time.isoformat(),
+            'account':    execution.acctNumber,
+            'orderId':    execution.orderId,
+            'permId':     execution.permId,
+            'side':       execution.side,
+            'shares':     execution.shares,
+            'price':      execution.price,
+            'commission': fill.commissionReport.commission,
+            'conId':      contract.conId,
+            'underlying': contract.symbol,
+            'expiry':     contract.lastTradeDateOrContractMonth,
+            'strike':     contract.strike,
+            'right':      contract.right,
+            'multiplier': multiplier,
+            'symbol':     symbol,
+            'desc':       desc,
+        }
+
+class SplitSink:
+    #
+    # Trade log split by underlying, one CSV file per underlying symbol (e.g. SPX.csv) in the given directory,
+    # each written incrementally by its own TradeLogWriter.
+    #
+    def __init__(self, directory):
+        self.directory = directory
+        self.writers   = {}    # underlying symbol -> TradeLogWriter
+
+        os.makedirs(directory, exist_ok=True)
+
+    def Write(self, changed_keys):
+        split_keys = {}
+
+        for key in changed_keys:
+            split_keys.setdefault(trade_fills[key].contract.symbol, []).append(key)
+
+        for underlying, keys in split_keys.items():
+            writer = self.writers.get(underlying)
+
+            if writer is None:
+                writer = self.writers[underlying] = TradeLogWriter(os.path.join(self.directory, underlying + '.csv'))
+
+            writer.Write(keys)
+
+def WriteTradeLog(changed_keys):
+    #
+    # Every sink gets the keys of the new or changed fills only, and keeps track of what it has written on its own.
+    #
+    for sink in sinks:
+        sink.Write(changed_keys)
+
+    if args.daemon:
+        print('{} TradeLog updated.'.format(datetime.datetime.now().strftime('%H:%M:%S')))
+
+def ParseGateway(text):
+    #
+    # Parses 'host:port:clientId' as given with --gateway, a missing port or clientId is taken from --port and --clientId.
+    #
+    host, port, client_id = (text.split(':') + ['', ''])[:3]
+
+    return host or args.host, int(port or args.port), int(client_id or args.clientId)
+
+class Gateway:
+    #
+    # Connection to one TWS or IB gateway. All gateways run on the same asyncio loop and their fills are merged into
+    # the one trade log. In daemon mode every gateway resyncs and reconnects on its own, so a gateway that is down
+    # does not hold up the others.
+    #
+    def __init__(self, host, port, client_id):
+        self.host             = host
+        self.port             = port
+        self.client_id        = client_id
+        self.last_resync_time = None
+        self.accounts         = []
+        self.fills            = None  # fills of the wrapper, execId -> Fill
+        self.num_fills        = 0     # number of fills of the wrapper that are processed
+        self.open_fills       = []    # processed fills that wait for their commission report
+        self.ib               = IB()
+
+        self.ib.connectedEvent += self.OnConnected
+
+        if args.daemon:
             #
-            # We want output to be sorted by date/time and order_id, so here we just add output line to trades_map map, and then dump output in a separate cycle.
+            # In daemon mode only the fills that just arrived are processed, the trade log is written after the network packet is handled.
             #
-            key   = dt.strftime('%Y.%m.%d %H:%M:%S') + '{:08d}'.format(fill.execution.orderId) + fill.execution.execId
-     
-            if not key in trades_map:
-                has_new_data = True
-            else:
-                ### print 'Warning: duplicate key ({}).'.format(key)
-                pass
+            self.ib.updateEvent += self.OnUpdate
+
+    def __str__(self):
+        return '{}:{}:{}'.format(self.host, self.port, self.client_id)
+
+    def OnConnected(self):
+        #
+        # Executions reported by TWS on (re)connect are processed at once here, the fills that arrive later are picked up
+        # by OnUpdate().
+        #
+        self.fills      = self.ib.wrapper.fills
+        self.num_fills  = len(self.fills)
+        self.open_fills = [fill for fill in self.fills.values() if not fill.commissionReport.execId]
+        self.accounts   = self.ib.managedAccounts()
 
+        if fill_store:
+            fill_store.SaveAccounts(str(self), self.accounts)
+
+        changed_keys = ProcessFills(self.ib.fills())
+
+        if changed_keys:
+            WriteTradeLog(changed_keys)
+
+    async def Connect(self):
+        #
+        # With a fill store only the executions after the last stored one of the accounts of this gateway are requested
+        # from TWS. Before the first connect the accounts are taken from the store.
+        #
+        exec_filter = None
+
+        if fill_store:
+            last_time = fill_store.LastTime(self.accounts or fill_store.Accounts(str(self)))
+
+            if last_time:
+                exec_filter = ExecutionFilter(time=util.formatIBDatetime(last_time - datetime.timedelta(seconds=60)))
+
+        try:
+            await asyncio.wait_for(self.ib.connectAsync(host=self.host, port=self.port, clientId=self.client_id, execFilter=exec_filter), args.timeout)
+        except asyncio.TimeoutError:
             #
-            # Symbol, Description, Action, Quantity, Price, Commission, Reg Fees, Date, TransactionID, Order Number, Transaction Type ID, Total Cost
+            # TWS does not finish the synchronization, drop the half-made connection so that it is retried from scratch.
             #
-            # SPX^^^130921P01660000,SPX Sep13 1660 Put,Buy To Open,2,3.15,2.27,0.06,09.12.2013 10:31:15 PM,111111111,222222222,34,-632.33
+            self.ib.disconnect()
+            raise
+
+        self.last_resync_time = datetime.datetime.now(datetime.timezone.utc)
+
+    async def ResyncFills(self):
+        #
+        # Work around ib_insync 'partial fills bug' without reconnecting: ask TWS for the executions of the last resync
+        # window while staying connected. Wrapper merges the reply into ib.fills() by execId, so only the missed fills are new.
+        #
+        resync_time = datetime.datetime.now(datetime.timezone.utc)
+        exec_filter = ExecutionFilter(time=util.formatIBDatetime(self.last_resync_time - datetime.timedelta(seconds=args.resyncInterval)))
+
+        try:
+            fills = await asyncio.wait_for(self.ib.reqExecutionsAsync(exec_filter), args.timeout)
+        except asyncio.TimeoutError:
             #
-            trades_map[key] = '{},{},{},{},{},{},{},{},{},{},34,{}\n'.format(symbol, desc, action, qty, price, commission, req_fees, dt.strftime('%x %X'), transaction_id, order_id, total_cost)
+            # TWS does not answer (or the connection died without being closed), the request would never finish so reconnect.
+            #
+            logging.warning('Warning: TWS {} does not answer the executions request, reconnecting...'.format(self))
+            self.ib.disconnect()
+            await self.Connect()
+            return
+
+        changed_keys = ProcessFills(fills)
+
+        if changed_keys:
+            logging.info('Resync {}: {} trade log lines added or updated'.format(self, len(changed_keys)))
+            WriteTradeLog(changed_keys)
+
+        self.last_resync_time = resync_time
+
+    async def Run(self):
+        while True:
+            await asyncio.sleep(args.resyncInterval)
+
+            try:
+                if self.ib.isConnected():
+                    await self.ResyncFills()
+                else:
+                    #
+                    # Connection to TWS is lost, reconnect.
+                    #
+                    logging.warning('Warning: connection to TWS {} is lost, reconnecting...'.format(self))
+                    self.ib.disconnect()
+                    await self.Connect()
+            except (OSError, asyncio.TimeoutError) as e:
+                logging.warning('Warning: unable to connect to TWS {}: {!r}'.format(self, e))
+            except Exception:
+                logging.error('Error: {}:\n{}'.format(self, traceback.format_exc()))
+
+    def OnUpdate(self):
+        #
+        # Called once per network packet, so a burst of fills results in a single trade log write. New fills are taken
+        # from the end of the fills of the wrapper, as execDetailsEvent and commissionReportEvent are only emitted for
+        # fills of orders that are known to this connection. A fill is processed again when its commission report arrives.
+        #
+        fills = self.ib.wrapper.fills
 
-        if has_new_data:       
-            with open(args.outputFile, "w") as out:
-                out.write('Symbol, Description, Action, Quantity, Price, Commission, Reg Fees, Date, TransactionID, Order Number, Transaction Type ID, Total Cost\n')
-        
-                for key in sorted(trades_map): 
-                    out.write(trades_map[key])
+        if fills is not self.fills:
+            return    # reconnecting, the fills are processed by OnConnected() once synchronized
 
-            if args.daemon:
-                print('{} TradeLog updated.'.format(datetime.datetime.now().strftime('%H:%M:%S')))
+        new_fills      = []
+        reported_fills = []
 
-        if args.daemon:
-            ib.sleep(1)
-        else:
-            break
+        if len(fills) > self.num_fills:
+            new_fills      = list(itertools.islice(fills.values(), self.num_fills, None))
+            self.num_fills = len(fills)
+
+        if self.open_fills:
+            reported_fills = [fill for fill in self.open_fills if fill.commissionReport.execId]
+
+        if not new_fills and not reported_fills:
+            return
+
+        self.open_fills = [fill for fill in self.open_fills + new_fills if not fill.commissionReport.execId]
+
+        changed_keys = ProcessFills(reported_fills + new_fills)
+
+        if changed_keys:
+            WriteTradeLog(changed_keys)
+
+
+ap = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+ap.add_argument('--host',            type=str,  default='127.0.0.1',      help='Host to connect to')
+ap.add_argument('--port',            type=int,  default=4001,             help='Port to connect to')
+ap.add_argument('--clientId',        type=int,  default=0,                help='Client Id')
+ap.add_argument('--gateway',         type=str,  default=[],               help='Gateway to connect to as host:port:clientId, can be given several times to merge fills of several gateways (default is --host, --port and --clientId)', action='append')
+ap.add_argument('--daemon',                     default=False,            help='Turn on deamon mode', action='store_true')
+ap.add_argument('--resyncInterval',  type=int,  default=60,               help='Interval (in seconds) to resync fills with TWS in daemon mode')
+ap.add_argument('--timeout',         type=int,  default=30,               help='Timeout (in seconds) to connect to TWS and for the executions requests')
+ap.add_argument('--incremental',                default=False,            help='Append new trades to the output file instead of rewriting the whole file on every update', action='store_true')
+ap.add_argument('--jsonFile',        type=str,  default='',               help='Also write the fills to this file in JSON lines format (disabled if empty)')
+ap.add_argument('--splitDir',        type=str,  default='',               help='Also write the trade log split by underlying, one file per underlying in this directory (disabled if empty)')
+ap.add_argument('--storeFile',       type=str,  default='',               help='SQLite file to keep fills between runs (disabled if empty)')
+ap.add_argument('--recordFile',      type=str,  default='',               help='Record the data received from TWS to this file (disabled if empty)')
+ap.add_argument('--replayFile',      type=str,  default='',               help='Replay a file written with --recordFile instead of connecting to TWS')
+ap.add_argument('--UTC',                        default=False,            help='Store trades in UTC timezone, i.e. do not convert time to Local Time Zone)', action='store_true')
+ap.add_argument('--logLevel',        type=int,  default=0,                help='Log level for log file output (DEBUG=10, INFO=20, WARNING=30, ERROR: 40, CRITICAL: 50)')
+ap.add_argument('--consoleLogLevel', type=int,  default=30,               help='Log level for console output  (DEBUG=10, INFO=20, WARNING=30, ERROR: 40, CRITICAL: 50)')
+ap.add_argument('outputFile',        type=str,  default='TradeLogIB.csv', help='Output file', nargs='?')
+args = ap.parse_args()
+
+InitLogging()
+gateways   = []
+fill_store = None
+sinks      = []
+
+try:    
+    SetLocale()
+
+    trades_map       = {}
+    trade_keys       = []
+    trade_fills      = {}
+    contract_cache   = {}
+    fill_times       = {}
+    exec_keys        = {}
+    utc_offsets      = {}
+    fill_store       = FillStore(args.storeFile) if args.storeFile else None
+
+    sinks.append(TradeLogSink(args.outputFile, args.incremental))
+
+    if args.jsonFile:
+        sinks.append(JsonLinesSink(args.jsonFile))
+
+    if args.splitDir:
+        sinks.append(SplitSink(args.splitDir))
+
+    dst_timezone = get_localzone()
+
+    if fill_store:
+        #
+        # TWS reports the executions of the current day only, fills of earlier days are dropped from the store so that
+        # the trade log gets the same fills as without it.
+        #
+        fill_store.Prune(datetime.datetime.combine(datetime.date.today(), datetime.time()))
+
+        changed_keys = ProcessFills(fill_store.Load(), save=False)
+
+        if changed_keys:
+            WriteTradeLog(changed_keys)
+
+    gateways = [Gateway(*ParseGateway(gateway)) for gateway in args.gateway] or [Gateway(args.host, args.port, args.clientId)]
+
+    if args.replayFile:
+        #
+        # Replay a recorded session at full speed, the fills end up in ib.fills() the same way as when connected to TWS.
+        #
+        Replayer(args.replayFile).replay(gateways[0].ib.client)
+        gateways[0].OnConnected()
+
+        args.daemon = False
+    else:
+        if args.recordFile:
+            for i, gateway in enumerate(gateways):
+                gateway.ib.client.recorder = Recorder(args.recordFile if len(gateways) == 1 else '{}.{}'.format(args.recordFile, i))
+
+        #
+        # Connect to all gateways at once. A gateway that can not be reached does not stop the others, in daemon mode
+        # it is retried later by its Run() loop.
+        #
+        results = util.run(asyncio.gather(*(gateway.Connect() for gateway in gateways), return_exceptions=True))
+
+        for gateway, result in zip(gateways, results):
+            if isinstance(result, Exception):
+                logging.warning('Warning: unable to connect to TWS {}: {}'.format(gateway, result))
+
+    if args.daemon:
+        print('Entering daemon mode...')
+
+        util.run(asyncio.gather(*(gateway.Run() for gateway in gateways)))
 
 except:
     logging.error('EXCEPTION:\n' + traceback.format_exc()) 
 
-if ib:
-    ib.disconnect()
+for gateway in gateways:
+    gateway.ib.disconnect()
+
+    if gateway.ib.client.recorder:
+        gateway.ib.client.recorder.close()
+
+if fill_store:
+    fill_store.Close()
+
+for sink in sinks:
+    if hasattr(sink, 'Close'):
+        sink.Close()
 
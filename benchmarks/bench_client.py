@@ -0,0 +1,35 @@
+"""
+Client._onSocketHasData framing and Client._decode.
+"""
+
+from benchmarks.harness import Case
+from benchmarks.clients import createClient, splitFields
+from benchmarks import data
+
+
+def cases(args):
+    tickPackets = data.packets(data.tickMessages(args.n))
+    execMsgs = data.executionMessages(args.n // 10)
+
+    framer = createClient()
+    framer._decode = lambda fields: None
+    decoder = createClient()
+
+    result = [
+        Case('client framing ticks', framer._onSocketHasData, tickPackets),
+        Case(
+            'client decode ticks', decoder._decode,
+            splitFields(tickPackets)),
+        Case(
+            'client decode executions', decoder._decode,
+            splitFields(data.packets(execMsgs)))]
+    if args.recording:
+        recorded = data.loadRecording(args.recording)
+        result += [
+            Case(
+                'client framing recorded', framer._onSocketHasData,
+                recorded),
+            Case(
+                'client decode recorded', decoder._decode,
+                splitFields(recorded))]
+    return result
@@ -0,0 +1,125 @@
+"""
+Benchmark of the client message decoding.
+
+Measures messages/sec through ``Client._onSocketHasData`` with only the
+original tick fast-paths (before) and with the full table of fast-path
+decoders (after). The stream is either synthetic or a raw capture of the
+TWS socket data given on the command line, either a file written by
+``ib_insync.Recorder`` or the raw length-prefixed messages.
+
+The cases also run as part of ``benchmarks.run``. Run standalone for
+the before/after speedup on a capture file, from the root of
+the repository:
+
+    python -m benchmarks.bench_decode [capture_file]
+"""
+
+import sys
+import time
+import struct
+import asyncio
+import argparse
+
+from ib_insync.recorder import Replayer
+
+from benchmarks.harness import Case
+from benchmarks.clients import createClient
+from benchmarks import data
+
+MESSAGES = [
+    ['1', '6', '1', '1', '1.25', '100', '3'],
+    ['2', '6', '1', '0', '100'],
+    ['46', '6', '1', '45', '1569000000'],
+    ['45', '6', '1', '49', '0.5'],
+    ['12', '1', '1', '0', '1', '1', '1.5', '200'],
+    ['3', '5', 'Filled', '10', '0', '1.25', '99', '0', '1.25', '1', '', '0'],
+    ['11', '-1', '5', '123', 'SPY', 'OPT', '20200101', '300', 'C', '100',
+        'SMART', 'USD', 'SPY   200101C00300000', 'SPY', '0001f4e8.5c0a.01',
+        '20200101  10:00:00', 'U1', 'CBOE', 'BOT', '1', '2.5', '99', '1',
+        '0', '1', '2.5', '', '', '', '', '1'],
+    ['59', '1', '0001f4e8.5c0a.01', '1.05', 'USD',
+        '1.7976931348623157E308', '1.7976931348623157E308', ''],
+    ['99', '1', '1', '1569000000', '1.5', '100', '3', 'ISLAND', ''],
+    ['99', '1', '3', '1569000000', '1.5', '1.6', '100', '200', '2'],
+    ['21', '6', '1', '13', '0.2', '0.5', '1.2', '-1', '-2', '0.1', '-2',
+        '300']]
+
+
+def createStream(numMessages):
+    frames = [data.frame(f) for f in MESSAGES]
+    return b''.join(
+        frames[i % len(frames)] for i in range(numMessages))
+
+
+def countMessages(stream):
+    n = pos = 0
+    while pos < len(stream):
+        pos += 4 + struct.unpack_from('>I', stream, pos)[0]
+        n += 1
+    return n
+
+
+def createDecoder(fullTable):
+    client = createClient()
+    if not fullTable:
+        client._handlers = {
+            k: v for k, v in client._handlers.items()
+            if k in (1, 2, 12, 46)}
+    return client
+
+
+def split(stream, chunkSize=4096):
+    return [
+        stream[i:i + chunkSize] for i in range(0, len(stream), chunkSize)]
+
+
+def run(stream, fullTable, chunkSize=4096):
+    client = createDecoder(fullTable)
+    chunks = split(stream, chunkSize)
+    t0 = time.perf_counter()
+    for chunk in chunks:
+        client._onSocketHasData(chunk)
+    return time.perf_counter() - t0
+
+
+def cases(args):
+    stream = (
+        b''.join(data.loadRecording(args.recording)) if args.recording
+        else createStream(args.n))
+    chunks = split(stream)
+    return [
+        Case(
+            f'decode 4096 byte chunks, {name}',
+            createDecoder(fullTable)._onSocketHasData, chunks)
+        for name, fullTable in [
+            ('tick fast-paths only', False), ('all fast-paths', True)]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('captureFile', nargs='?', default='')
+    parser.add_argument('-n', '--numMessages', type=int, default=200000)
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    if args.captureFile:
+        try:
+            stream = b''.join(d for _, d in Replayer(args.captureFile))
+        except ValueError:
+            with open(args.captureFile, 'rb') as f:
+                stream = f.read()
+    else:
+        stream = createStream(args.numMessages)
+    numMessages = countMessages(stream)
+
+    results = {}
+    for name, fullTable in [('before', False), ('after', True)]:
+        best = min(run(stream, fullTable) for _ in range(args.repeat))
+        results[name] = numMessages / best
+        print(f'{name:>8}: {results[name]:12,.0f} msgs/sec')
+    print(f'{"speedup":>8}: {results["after"] / results["before"]:12.2f}x')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
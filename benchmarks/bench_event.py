@@ -0,0 +1,64 @@
+"""
+Event emit, connect and disconnect of eventkit.Event and FastEvent.
+"""
+
+import eventkit
+
+from ib_insync.event import FastEvent
+
+from benchmarks.harness import Case
+
+
+class Listener:
+
+    def onEvent(self, *args):
+        pass
+
+
+def handler(*args):
+    pass
+
+
+def cases(args):
+    result = []
+    listeners = [Listener() for _ in range(1000)]
+    for cls in (eventkit.Event, FastEvent):
+        name = cls.__name__
+
+        oneHandler = cls('one')
+        oneHandler += handler
+
+        fiveHandlers = cls('five')
+        for _ in range(5):
+            fiveHandlers += handler
+
+        methods = cls('methods')
+        for listener in listeners[:5]:
+            methods += listener.onEvent
+
+        # connect and disconnect of a listener next to 1000 others
+        crowded = cls('crowded')
+        for listener in listeners:
+            crowded += listener.onEvent
+        newcomers = [Listener() for _ in range(args.n // 100)]
+
+        def connectDisconnect(listener, event=crowded):
+            event += listener.onEvent
+            event -= listener.onEvent
+
+        def contains(listener, event=crowded):
+            return listener.onEvent in event
+
+        result += [
+            Case(f'{name} emit, 1 handler', oneHandler.emit, range(args.n)),
+            Case(
+                f'{name} emit, 5 handlers', fiveHandlers.emit,
+                range(args.n)),
+            Case(
+                f'{name} emit, 5 bound methods', methods.emit,
+                range(args.n)),
+            Case(
+                f'{name} connect+disconnect, 1000 slots',
+                connectDisconnect, newcomers),
+            Case(f'{name} in, 1000 slots', contains, listeners)]
+    return result
@@ -0,0 +1,63 @@
+"""
+FlexReport.extract on a synthetic statement.
+"""
+
+import io
+import random
+import xml.etree.ElementTree as et
+
+from ib_insync import FlexReport
+
+from benchmarks.harness import Case
+
+
+def createReport(numTrades, seed=0) -> FlexReport:
+    rnd = random.Random(seed)
+    lines = [
+        '<FlexQueryResponse queryName="bench" type="AF">',
+        '<FlexStatements count="1">',
+        '<FlexStatement accountId="DU123456" fromDate="20190101" '
+        'toDate="20191231">',
+        '<TradeConfirms>']
+    for i in range(numTrades):
+        strike = 2800 + 5 * rnd.randrange(40)
+        lines.append(
+            f'<TradeConfirm accountId="DU123456" currency="USD" '
+            f'assetCategory="OPT" symbol="SPX   191220C0{strike}000" '
+            f'description="SPX 20DEC19 {strike} C" conid="{1000000 + i}" '
+            f'underlyingSymbol="SPX" multiplier="100" strike="{strike}" '
+            f'expiry="20191220" putCall="C" '
+            f'tradeID="{2000000 + i}" orderID="{3000000 + i}" '
+            f'execID="0000e0d5.{i:08x}.01.01" '
+            f'tradeDate="20190102" tradeTime="10:00:{i % 60:02d}" '
+            f'buySell="{rnd.choice(("BUY", "SELL"))}" '
+            f'quantity="{rnd.randrange(1, 10)}" '
+            f'price="{rnd.uniform(0.05, 50):.2f}" '
+            f'commission="-{rnd.uniform(0.5, 5):.4f}" '
+            f'exchange="CBOE" orderType="LMT" levelOfDetail="EXECUTION" />')
+    lines += [
+        '</TradeConfirms>', '</FlexStatement>', '</FlexStatements>',
+        '</FlexQueryResponse>']
+    report = FlexReport()
+    report.data = '\n'.join(lines).encode()
+    report.root = et.fromstring(report.data)
+    return report
+
+
+def cases(args):
+    report = createReport(args.n // 10)
+    return [
+        Case(
+            'FlexReport.extract',
+            lambda _: report.extract('TradeConfirm'), range(5)),
+        Case(
+            'FlexReport.extract no parseNumbers',
+            lambda _: report.extract('TradeConfirm', False), range(5)),
+        Case(
+            'FlexReport.columns arrays',
+            lambda _: report.columns(
+                'TradeConfirm', parseDates=True, arrays=True), range(5)),
+        Case(
+            'FlexReport.stream',
+            lambda _: list(FlexReport.stream(
+                io.BytesIO(report.data), 'TradeConfirm')), range(5))]
@@ -0,0 +1,39 @@
+"""
+Object construction, event emitting and datetime parsing.
+"""
+
+import datetime
+
+from ib_insync import Event, Contract, Execution, BarData, util
+
+from benchmarks.harness import Case
+
+
+def cases(args):
+    n = args.n
+    execKwargs = dict(
+        execId='0000e0d5.00000001.01.01', time=datetime.datetime.now(),
+        acctNumber='DU123456', exchange='CBOE', side='BOT', shares=1.0,
+        price=2.5, permId=1, clientId=1, orderId=1, cumQty=1.0,
+        avgPrice=2.5, lastLiquidity=1)
+
+    barArgs = (
+        datetime.datetime.now(), 100.0, 101.5, 99.5, 100.5, 12000, 100.2, 85)
+
+    event = Event('bench')
+    event += lambda *args: None
+
+    dates = [
+        ('20190101  10:00:00', '20190101', '1546333200')[i % 3]
+        for i in range(n)]
+
+    return [
+        Case('Object.__init__ Contract()', lambda _: Contract(), range(n)),
+        Case(
+            'Object.__init__ Execution(**kw)',
+            lambda _: Execution(**execKwargs), range(n)),
+        Case(
+            'Object.__init__ BarData(*args)',
+            lambda _: BarData(*barArgs), range(n)),
+        Case('Event.emit 1 handler', event.emit, range(n)),
+        Case('util.parseIBDatetime', util.parseIBDatetime, dates)]
@@ -0,0 +1,79 @@
+"""
+TradeLogIB.py trade log formatting and writing.
+"""
+
+import os
+import sys
+import runpy
+import tempfile
+
+from ib_insync import Recorder
+
+from benchmarks.harness import Case
+from benchmarks import data
+
+SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'TradeLogIB.py')
+
+
+def runScript(packets, outputFile):
+    """
+    Run TradeLogIB.py with the packets replayed
+    and return the globals of the script.
+    """
+    recording = outputFile + '.rec'
+    with Recorder(recording) as recorder:
+        recorder.write(data.handshake())
+        for packet in packets:
+            recorder.write(packet)
+    argv = sys.argv
+    sys.argv = [
+        SCRIPT, '--replayFile', recording, '--incremental',
+        '--consoleLogLevel', '40', outputFile]
+    try:
+        # run_path returns a copy, the functions see the real globals
+        return runpy.run_path(SCRIPT, run_name='__main__')[
+            'ProcessFills'].__globals__
+    finally:
+        sys.argv = argv
+        os.remove(recording)
+
+
+def cases(args):
+    tmpDir = tempfile.mkdtemp()
+    outputFile = os.path.join(tmpDir, 'TradeLogIB.csv')
+    packets = (
+        data.loadRecording(args.recording) if args.recording else
+        data.packets(data.executionMessages(args.n // 10)))
+    g = runScript(packets, outputFile)
+    fills = data.replayed(packets).fills()
+    incremental = g['TradeLogSink'](outputFile, True)
+    fullRewrite = g['TradeLogSink'](outputFile, False)
+
+    def setupIncremental():
+        g['trades_map'].clear()
+        g['trade_keys'].clear()
+        g['sinks'][:] = [incremental]
+        incremental.writer.__init__(outputFile)
+
+    def processAndWrite(fill):
+        changed_keys = g['ProcessFills']([fill], save=False)
+        if changed_keys:
+            g['WriteTradeLog'](changed_keys)
+
+    def setupFullRewrite():
+        g['sinks'][:] = [fullRewrite]
+        g['ProcessFills'](fills, save=False)
+
+    blocks = [fills[i:i + 100] for i in range(0, len(fills), 100)]
+
+    return [
+        Case('TradeLogIB FormatFill', g['FormatFill'], fills),
+        Case('TradeLogIB FormatFills per 100', g['FormatFills'], blocks),
+        Case(
+            'TradeLogIB per fill incremental', processAndWrite,
+            fills, setupIncremental),
+        Case(
+            'TradeLogIB full rewrite',
+            lambda _: g['WriteTradeLog'](['']), range(5),
+            setupFullRewrite)]
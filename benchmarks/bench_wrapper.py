@@ -0,0 +1,173 @@
+"""
+Wrapper tick and execution handlers.
+"""
+
+import random
+
+from ibapi.wrapper import EWrapper
+
+from ib_insync import Stock, TickCapture, OrderBook
+
+from benchmarks.harness import Case
+from benchmarks.clients import createClient, splitFields
+from benchmarks import data
+
+
+class ExecCollector(EWrapper):
+    """
+    Collect the arguments of the execDetails callbacks.
+    """
+
+    def __init__(self):
+        self.execDetailsArgs = []
+
+    def execDetails(self, reqId, contract, execution):
+        self.execDetailsArgs.append((reqId, contract, execution))
+
+
+def cases(args):
+    ib = data.replayed([])
+    wrapper = ib.wrapper
+    numReqIds = 10
+    for reqId in range(1, numReqIds + 1):
+        wrapper.startTicker(reqId, Stock(f'S{reqId}', 'SMART', 'USD'), 'mkt')
+
+    rnd = random.Random(0)
+    priceTicks = [
+        (1 + i % numReqIds, rnd.choice((1, 2, 4)),
+            round(rnd.uniform(1, 100), 2), rnd.randrange(1, 1000))
+        for i in range(args.n)]
+    sizeTicks = [
+        (1 + i % numReqIds, rnd.choice((0, 3, 5, 8)), rnd.randrange(1, 1000))
+        for i in range(args.n)]
+    latePriceTicks = [
+        (1 + i % numReqIds, rnd.choice((37, 50, 51, 52)),
+            round(rnd.uniform(1, 100), 2), 0)
+        for i in range(args.n)]
+    lateSizeTicks = [
+        (1 + i % numReqIds, rnd.choice((86, 87, 89)), rnd.randrange(1, 1000))
+        for i in range(args.n)]
+
+    # consumer that only reads the latest ticker fields
+    latest = data.replayed([])
+    latest.KeepTicks = False
+    latestWrapper = latest.wrapper
+    for reqId in range(1, numReqIds + 1):
+        latestWrapper.startTicker(
+            reqId, Stock(f'S{reqId}', 'SMART', 'USD'), 'mkt')
+
+    captured = data.replayed([])
+    capturedWrapper = captured.wrapper
+    capture = TickCapture()
+    for reqId in range(1, numReqIds + 1):
+        capturedWrapper.startTicker(
+            reqId, Stock(f'S{reqId}', 'SMART', 'USD'), 'mkt')
+        capturedWrapper.reqId2Capture[reqId] = capture
+
+    # market depth updates for a book of 10 levels per side,
+    # mostly updates of existing levels as from a real feed
+    depthUpdates = []
+    numLevels = [0, 0]
+    for _ in range(args.n):
+        side = rnd.randrange(2)
+        n = numLevels[side]
+        r = rnd.random()
+        if n < 10 and (not n or r < 0.1):
+            operation, position = 0, rnd.randrange(n + 1)
+            numLevels[side] += 1
+        elif r < 0.2:
+            operation, position = 2, rnd.randrange(n)
+            numLevels[side] -= 1
+        else:
+            operation, position = 1, rnd.randrange(n)
+        depthUpdates.append((
+            position, '', operation, side,
+            round(rnd.uniform(99, 101), 2), rnd.randrange(1, 1000)))
+
+    depth = data.replayed([])
+    depthWrapper = depth.wrapper
+    depthWrapper.startTicker(1, Stock('D1', 'SMART', 'USD'), 'mktDepth')
+    depthWrapper.startTicker(2, Stock('D2', 'SMART', 'USD'), 'mktDepth')
+    depthWrapper.reqId2OrderBook[2] = book = OrderBook(10)
+
+    def resetDepth():
+        depthWrapper.tcpDataArrived()
+        ticker = depthWrapper.reqId2Ticker[1]
+        ticker.domBids.clear()
+        ticker.domAsks.clear()
+        book.clear()
+
+    # let the client decoder create the execDetails arguments
+    collector = ExecCollector()
+    client = createClient()
+    client.wrapper = collector
+    execFields = splitFields(data.packets(
+        data.executionMessages(args.n // 10)))
+
+    def resetFills():
+        wrapper.fills.clear()
+        collector.execDetailsArgs.clear()
+        for fields in execFields:
+            client._decode(fields)
+
+    # packets with ticks for an option chain of 1000 strikes,
+    # with a full delivery cycle per packet
+    chain = data.replayed([])
+    chainWrapper = chain.wrapper
+    numStrikes = 1000
+    for reqId in range(1, numStrikes + 1):
+        chainWrapper.startTicker(
+            reqId, Stock(f'C{reqId}', 'SMART', 'USD'), 'mkt')
+    packets = [
+        [(rnd.randrange(1, numStrikes + 1), rnd.choice((1, 2, 4)),
+            round(rnd.uniform(1, 100), 2), rnd.randrange(1, 1000))
+            for _ in range(100)]
+        for _ in range(args.n // 100)]
+
+    def handlePacket(ticks):
+        chainWrapper.tcpDataArrived()
+        for tick in ticks:
+            chainWrapper.priceSizeTick(*tick)
+        chainWrapper.tcpDataProcessed()
+
+    resetFills()
+    return [
+        Case(
+            'wrapper priceSizeTick',
+            lambda a: wrapper.priceSizeTick(*a), priceTicks,
+            wrapper.tcpDataArrived),
+        Case(
+            'wrapper priceSizeTick captured',
+            lambda a: capturedWrapper.priceSizeTick(*a), priceTicks,
+            capturedWrapper.tcpDataArrived),
+        Case(
+            'wrapper tickSize',
+            lambda a: wrapper.tickSize(*a), sizeTicks,
+            wrapper.tcpDataArrived),
+        Case(
+            'wrapper priceSizeTick late tick types',
+            lambda a: wrapper.priceSizeTick(*a), latePriceTicks,
+            wrapper.tcpDataArrived),
+        Case(
+            'wrapper tickSize late tick types',
+            lambda a: wrapper.tickSize(*a), lateSizeTicks,
+            wrapper.tcpDataArrived),
+        Case(
+            'wrapper priceSizeTick KeepTicks=False',
+            lambda a: latestWrapper.priceSizeTick(*a), priceTicks,
+            latestWrapper.tcpDataArrived),
+        Case(
+            'wrapper packet of 100 ticks, 1000 tickers',
+            handlePacket, packets),
+        Case(
+            'wrapper updateMktDepthL2',
+            lambda a: depthWrapper.updateMktDepthL2(1, *a), depthUpdates,
+            resetDepth),
+        Case(
+            'wrapper updateMktDepthL2 OrderBook',
+            lambda a: depthWrapper.updateMktDepthL2(2, *a), depthUpdates,
+            resetDepth),
+        Case(
+            'wrapper execDetails',
+            lambda a: wrapper.execDetails(*a), collector.execDetailsArgs,
+            resetFills)]
@@ -0,0 +1,61 @@
+"""
+Clients that decode messages without a connection, for the benchmarks.
+"""
+
+import struct
+
+import ibapi.decoder
+from ibapi.wrapper import EWrapper
+
+from ib_insync.client import Client
+
+from benchmarks import data
+
+
+class NullWrapper(EWrapper):
+    """
+    Wrapper that accepts every callback and does nothing.
+    """
+
+    def __getattribute__(self, name):
+        if name.startswith('_'):
+            return object.__getattribute__(self, name)
+        return NullWrapper._null
+
+    @staticmethod
+    def _null(*args):
+        pass
+
+
+def createClient() -> Client:
+    """
+    Create a client in the connected state that decodes messages
+    of the benchmark server version to a :class:`NullWrapper`.
+    """
+    wrapper = NullWrapper()
+    client = Client(wrapper)
+    client._priceSizeTick = None
+    client.decoder = ibapi.decoder.Decoder(wrapper, None)
+    client.decoder.serverVersion = data.SERVER_VERSION
+    client.serverVersion_ = data.SERVER_VERSION
+    client.connState = Client.CONNECTED
+    client._handlers = client._createHandlers()
+    return client
+
+
+def splitFields(packets) -> list:
+    """
+    Split the packets into the field lists of the messages
+    as given to ``Client._decode``.
+    """
+    stream = b''.join(packets)
+    msgs = []
+    pos = 0
+    while pos < len(stream):
+        end = pos + 4 + struct.unpack_from('>I', stream, pos)[0]
+        fields = stream[pos + 4:end].split(b'\0')
+        fields.pop()
+        if len(fields) > 2:
+            msgs.append(fields)
+        pos = end
+    return msgs
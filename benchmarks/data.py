@@ -0,0 +1,98 @@
+"""
+Synthetic and recorded benchmark inputs.
+"""
+
+import os
+import random
+import struct
+import tempfile
+
+from ib_insync import IB, Recorder, Replayer, MockServer
+
+SERVER_VERSION = MockServer.ServerVersion
+
+
+def frame(fields) -> bytes:
+    """
+    Serialize the fields to a length-prefixed message as sent by TWS.
+    """
+    msg = '\0'.join(fields).encode() + b'\0'
+    return struct.pack('>I', len(msg)) + msg
+
+
+def handshake() -> bytes:
+    """
+    Messages that TWS sends when the API connection starts.
+    """
+    return (
+        frame([str(SERVER_VERSION), '20190101 09:30:00 EST']) +
+        frame(['9', '1', '1']) + frame(['15', '1', 'DU123456']))
+
+
+def tickMessages(n, numReqIds=10, seed=0) -> list:
+    """
+    Fields of ``n`` price and size tick messages.
+    """
+    rnd = random.Random(seed)
+    msgs = []
+    for i in range(n):
+        reqId = str(1 + i % numReqIds)
+        if i % 2:
+            msgs.append([
+                '2', '6', reqId, rnd.choice('0358'),
+                str(rnd.randrange(1, 1000))])
+        else:
+            msgs.append([
+                '1', '6', reqId, rnd.choice('124'),
+                f'{rnd.uniform(1, 100):.2f}',
+                str(rnd.randrange(1, 1000)), '0'])
+    return msgs
+
+
+def executionMessages(n) -> list:
+    """
+    Fields of ``n`` live execDetails messages, each followed by
+    its commissionReport message.
+    """
+    server = MockServer()
+    msgs = []
+    for _ in range(n):
+        contract, execution, commission = server.createExecution()
+        msgs.append(['11', '-1', '0'] + contract + execution)
+        msgs.append(commission)
+    return msgs
+
+
+def packets(msgs, packetSize=1400) -> list:
+    """
+    Frame the messages and cut the stream into network packets.
+    """
+    data = b''.join(frame(m) for m in msgs)
+    return [
+        data[i:i + packetSize] for i in range(0, len(data), packetSize)]
+
+
+def loadRecording(path) -> list:
+    """
+    Packets of a recording made with ``ib_insync.Recorder``.
+    """
+    return [data for _, data in Replayer(path)]
+
+
+def replayed(packets) -> IB:
+    """
+    Return an IB instance that has the handshake
+    and the given packets replayed into it.
+    """
+    fd, path = tempfile.mkstemp(suffix='.rec')
+    os.close(fd)
+    try:
+        with Recorder(path) as recorder:
+            recorder.write(handshake())
+            for data in packets:
+                recorder.write(data)
+        ib = IB()
+        Replayer(path).replay(ib.client)
+    finally:
+        os.remove(path)
+    return ib
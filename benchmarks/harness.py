@@ -0,0 +1,117 @@
+"""
+Benchmark harness: Runs the cases and reports throughput,
+latency percentiles and memory allocations.
+"""
+
+import gc
+import sys
+import json
+import time
+import tracemalloc
+from collections import namedtuple
+
+Case = namedtuple('Case', 'name func items setup')
+Case.__new__.__defaults__ = (None,)
+Case.__doc__ = """
+Benchmark case: ``func(item)`` is called for each of the items,
+``setup()`` (if given) is called before every pass over the items.
+"""
+
+Result = namedtuple(
+    'Result', 'name n opsPerSec p50 p90 p99 max allocPerOp peakKiB')
+
+
+def measure(case, repeat=5, trace=True) -> Result:
+    """
+    Measure a benchmark case:
+
+    * Throughput is the best of ``repeat`` passes over all items;
+    * Latency percentiles (in microseconds) are from a separate pass
+      with every call timed;
+    * Allocations are the number of memory blocks per call that are
+      still allocated after the pass, plus the peak traced memory,
+      measured in a pass with tracemalloc enabled.
+    """
+    func = case.func
+    items = case.items
+    n = len(items)
+    gcEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        best = float('inf')
+        for _ in range(repeat):
+            if case.setup:
+                case.setup()
+            t0 = time.perf_counter()
+            for item in items:
+                func(item)
+            best = min(best, time.perf_counter() - t0)
+
+        if case.setup:
+            case.setup()
+        timer = time.perf_counter_ns
+        latencies = []
+        for item in items:
+            t0 = timer()
+            func(item)
+            latencies.append(timer() - t0)
+        latencies.sort()
+
+        allocPerOp = peakKiB = float('nan')
+        if trace:
+            if case.setup:
+                case.setup()
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            for item in items:
+                func(item)
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            blocks = sum(
+                s.count_diff for s in after.compare_to(before, 'filename'))
+            allocPerOp = blocks / n
+            peakKiB = peak / 1024
+    finally:
+        if gcEnabled:
+            gc.enable()
+
+    def pct(p):
+        return latencies[min(n - 1, int(p * n))] / 1000
+
+    return Result(
+        case.name, n, n / best, pct(0.5), pct(0.9), pct(0.99),
+        latencies[-1] / 1000, allocPerOp, peakKiB)
+
+
+def report(results, baseline=None, file=sys.stdout):
+    """
+    Print the results as table, with the change in throughput
+    relative to the baseline results (if given).
+    """
+    baseline = {r['name']: r for r in baseline or []}
+    print(
+        f'{"benchmark":<36} {"n":>8} {"ops/sec":>12} {"p50":>8} '
+        f'{"p90":>8} {"p99":>8} {"max":>9} {"blk/op":>7} {"peakKiB":>9}'
+        + ('  change' if baseline else ''), file=file)
+    for r in results:
+        line = (
+            f'{r.name:<36} {r.n:>8} {r.opsPerSec:>12,.0f} {r.p50:>8.2f} '
+            f'{r.p90:>8.2f} {r.p99:>8.2f} {r.max:>9.1f} '
+            f'{r.allocPerOp:>7.2f} {r.peakKiB:>9.1f}')
+        base = baseline.get(r.name)
+        if base:
+            change = r.opsPerSec / base['opsPerSec'] - 1
+            line += f'  {change:+7.1%}'
+        print(line, file=file)
+    print('(latencies in microseconds)', file=file)
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump([r._asdict() for r in results], f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,32 @@
+"""
+Run the mock TWS server standalone, for load testing TradeLogIB.py
+or other clients.
+
+Usage, from the root of the repository:
+
+    python -m benchmarks.mockserver [--host HOST] [--port PORT]
+        [--fillRate RATE] [--tickRate RATE]
+"""
+
+import sys
+import logging
+import argparse
+
+from ib_insync import MockServer, util
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock TWS server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4002)
+    parser.add_argument('--fillRate', type=float, default=0.0)
+    parser.add_argument('--tickRate', type=float, default=0.0)
+    args = parser.parse_args()
+    util.logToConsole(logging.INFO)
+    MockServer(
+        args.host, args.port,
+        fillRate=args.fillRate, tickRate=args.tickRate).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
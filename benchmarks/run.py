@@ -0,0 +1,64 @@
+"""
+Run the benchmark suite.
+
+Usage, from the root of the repository:
+
+    python -m benchmarks.run [-n N] [-k FILTER] [--recording FILE]
+        [--save FILE] [--compare FILE]
+
+With ``--recording`` the client, decode, wrapper and TradeLogIB
+benchmarks also run on a file made with ``ib_insync.Recorder``
+(``--recordFile`` option of TradeLogIB.py). Results can be saved and
+compared against a previous run to spot regressions.
+"""
+
+import sys
+import asyncio
+import argparse
+
+from benchmarks import harness
+from benchmarks import (
+    bench_client, bench_wrapper, bench_objects, bench_flexreport,
+    bench_tradelog, bench_event, bench_decode)
+
+MODULES = [
+    bench_client, bench_wrapper, bench_objects, bench_flexreport,
+    bench_tradelog, bench_event, bench_decode]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ib_insync benchmarks')
+    parser.add_argument(
+        '-n', type=int, default=100000,
+        help='Number of synthetic items (ticks) per benchmark')
+    parser.add_argument(
+        '-k', '--filter', default='',
+        help='Only run the benchmarks with this in the name')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument(
+        '--recording', default='',
+        help='Recorded session to use as input')
+    parser.add_argument(
+        '--noTrace', action='store_true',
+        help='Skip the allocation tracing')
+    parser.add_argument('--save', default='', help='Save results as JSON')
+    parser.add_argument(
+        '--compare', default='',
+        help='Compare with results saved earlier')
+    args = parser.parse_args()
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    results = []
+    for module in MODULES:
+        for case in module.cases(args):
+            if args.filter in case.name:
+                results.append(harness.measure(
+                    case, args.repeat, not args.noTrace))
+    harness.report(
+        results, harness.load(args.compare) if args.compare else None)
+    if args.save:
+        harness.save(results, args.save)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
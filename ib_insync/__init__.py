@@ -48,16 +48,21 @@ from .order import (
     Trade, OrderStatus, Order, LimitOrder, MarketOrder,
     StopOrder, StopLimitOrder)
 from .ticker import Ticker
+from .tickcapture import TickCapture
+from .orderbook import OrderBook
 from .ib import IB
 from .client import Client
 from .wrapper import Wrapper
 from .flexreport import FlexReport, FlexError
 from .ibcontroller import IBC, IBController, Watchdog
+from .recorder import Recorder, Replayer
+from .mockserver import MockServer
 
 __all__ = ['util', 'Event']
 for _m in (
-        objects, contract, order, ticker, ib,
-        client, wrapper, flexreport, ibcontroller):
+        objects, contract, order, ticker, tickcapture, orderbook, ib,
+        client, wrapper, flexreport, ibcontroller, recorder,
+        mockserver):
     __all__ += _m.__all__
 
 del sys
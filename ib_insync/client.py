@@ -1,3 +1,4 @@
+import sys
 import struct
 import asyncio
 import logging
@@ -7,12 +8,16 @@ from collections import deque
 from typing import List
 
 import ibapi
+import ibapi.commission_report
 from ibapi.client import EClient
 from ibapi.wrapper import EWrapper, iswrapper
 from ibapi.common import UNSET_INTEGER, UNSET_DOUBLE
+from ibapi.server_versions import (
+    MIN_SERVER_VER_MARKET_CAP_PRICE, MIN_SERVER_VER_LAST_LIQUIDITY)
 from eventkit import Event
 
-from ib_insync.objects import ConnectionStats
+from ib_insync.objects import (
+    ConnectionStats, Execution, TickAttribBidAsk, TickAttribLast)
 from ib_insync.contract import Contract
 import ib_insync.util as util
 
@@ -49,6 +54,10 @@ class Client(EClient):
 
     * Automatic request throttling.
 
+    * Optional recording of the received data by setting
+      ``client.recorder`` to a :class:`.Recorder`;
+      The recording can be replayed with :class:`.Replayer`.
+
     * Optional ``wrapper.tcpDataArrived()`` method;
       If the wrapper has this method it is invoked directly after
       a network packet has arrived.
@@ -94,10 +103,14 @@ class Client(EClient):
         self._tcpDataArrived = getattr(wrapper, 'tcpDataArrived', None)
         self._tcpDataProcessed = getattr(wrapper, 'tcpDataProcessed', None)
 
+        # optional recorder of the received data, see ib_insync.recorder
+        self.recorder = None
+
     def reset(self):
         EClient.reset(self)
         self._readyEvent.clear()
-        self._data = b''
+        self._data = bytearray()
+        self._recvQ = deque()
         self._connectOptions = b''
         self._reqIdSeq = 0
         self._accounts = None
@@ -107,6 +120,8 @@ class Client(EClient):
         self._isThrottling = False
         self._msgQ = deque()
         self._timeQ = deque()
+        self._handlers = {}
+        self._execContracts = {}
 
     def run(self):
         self._loop.run_forever()
@@ -181,6 +196,7 @@ class Client(EClient):
         self.clientId = clientId
         self.setConnState(EClient.CONNECTING)
         self.conn = Connection(host, port)
+        self.conn.recorder = self.recorder
         self.conn.connected = self._onSocketConnected
         self.conn.hasData = self._onSocketHasData
         self.conn.disconnected = self._onSocketDisconnected
@@ -248,33 +264,45 @@ class Client(EClient):
         if self._tcpDataArrived:
             self._tcpDataArrived()
 
-        self._data += data
+        # the receive buffer is only appended to and messages are read
+        # from it at an offset, so that a burst of messages is framed in
+        # linear time; the consumed part is dropped once per packet
+        buf = self._data
+        buf += data
         self._numBytesRecv += len(data)
-
-        while True:
-            if len(self._data) <= 4:
-                break
-            # 4 byte prefix tells the message length
-            msgEnd = 4 + struct.unpack('>I', self._data[:4])[0]
-            if len(self._data) < msgEnd:
-                # insufficient data for now
-                break
-            msg = self._data[4:msgEnd]
-            self._data = self._data[msgEnd:]
+        bufEnd = len(buf)
+        pos = 0
+        msgs = self._recvQ
+        with memoryview(buf) as view:
+            while bufEnd - pos > 4:
+                # 4 byte prefix tells the message length
+                msgEnd = pos + 4 + struct.unpack_from('>I', buf, pos)[0]
+                if bufEnd < msgEnd:
+                    # insufficient data for now
+                    break
+                msgs.append(view[pos + 4:msgEnd].tobytes())
+                pos = msgEnd
+        del buf[:pos]
+
+        # a handler can re-enter this method (with nested event loops),
+        # so the framed messages are taken from a shared queue to have
+        # them handled in order
+        while msgs and msgs is self._recvQ:
+            msg = msgs.popleft()
             fields = msg.split(b'\0')
             fields.pop()  # pop off last empty element
             self._numMsgRecv += 1
 
             if debug:
-                self._logger.debug(
-                    '<<< %s', ','.join(
-                        f.decode(errors='backslashreplace') for f in fields))
+                self._logger.debug('<<< %s', ','.join(
+                    f.decode(errors='backslashreplace') for f in fields))
 
             if not self.serverVersion_ and len(fields) == 2:
                 # this concludes the handshake
                 version, _connTime = fields
                 self.serverVersion_ = int(version)
                 self.decoder.serverVersion = self.serverVersion_
+                self._handlers = self._createHandlers()
                 self.setConnState(EClient.CONNECTED)
                 self.startApi()
                 self.wrapper.connectAck()
@@ -344,48 +372,207 @@ class Client(EClient):
         callback handler.
         """
         msgId = int(fields[0])
+        handler = self._handlers.get(msgId)
+        if handler:
+            handler(fields)
+        else:
+            self.decoder.interpret(fields)
 
-        # bypass the ibapi decoder for ticks for more efficiency
-        if msgId == 2:
-            _, _, reqId, tickType, size = fields
-            self.wrapper.tickSize(
-                int(reqId), int(tickType), int(size))
-            return
-        elif msgId == 1:
-            if self._priceSizeTick:
-                _, _, reqId, tickType, price, size, _ = fields
-                if price:
-                    self._priceSizeTick(
-                        int(reqId), int(tickType),
-                        float(price), int(size))
-                return
-        elif msgId == 12:
-            _, _, reqId, position, operation, side, price, size = fields
-            self.wrapper.updateMktDepth(
-                int(reqId), int(position),
-                int(operation), int(side), float(price), int(size))
-            return
-        elif msgId == 46:
-            _, _, reqId, tickType, value = fields
-            self.wrapper.tickString(
-                int(reqId), int(tickType), value.decode())
+    def _createHandlers(self):
+        """
+        Create the table of msgId -> handler for the messages that bypass
+        the ibapi decoder for more efficiency. The field layout of some
+        messages depends on the server version, these are only included
+        for the server versions they are written for.
+        """
+        handlers = {
+            2: self._decodeTickSize,
+            9: self._decodeNextValidId,
+            12: self._decodeUpdateMktDepth,
+            13: self._decodeUpdateMktDepthL2,
+            15: self._decodeManagedAccounts,
+            6: self._decodeAccountValue,
+            21: self._decodeTickOptionComputation,
+            45: self._decodeTickGeneric,
+            46: self._decodeTickString,
+            59: self._decodeCommissionReport,
+            99: self._decodeTickByTick}
+        if self._priceSizeTick:
+            handlers[1] = self._decodePriceSizeTick
+        if self.serverVersion_ >= MIN_SERVER_VER_MARKET_CAP_PRICE:
+            handlers[3] = self._decodeOrderStatus
+        if self.serverVersion_ >= MIN_SERVER_VER_LAST_LIQUIDITY:
+            handlers[11] = self._decodeExecDetails
+        return handlers
+
+    def _decodePriceSizeTick(self, fields):
+        _, _, reqId, tickType, price, size, _ = fields
+        if price:
+            self._priceSizeTick(
+                int(reqId), int(tickType), float(price), int(size))
+
+    def _decodeTickSize(self, fields):
+        _, _, reqId, tickType, size = fields
+        self.wrapper.tickSize(int(reqId), int(tickType), int(size))
+
+    def _decodeOrderStatus(self, fields):
+        (_, orderId, status, filled, remaining, avgFillPrice, permId,
+            parentId, lastFillPrice, clientId, whyHeld, mktCapPrice) = fields
+        self.wrapper.orderStatus(
+            int(orderId), status.decode(), float(filled or 0),
+            float(remaining or 0), float(avgFillPrice or 0),
+            int(permId or 0), int(parentId or 0), float(lastFillPrice or 0),
+            int(clientId or 0), whyHeld.decode(), float(mktCapPrice or 0))
+
+    def _decodeAccountValue(self, fields):
+        if len(fields) != 6:
+            self.decoder.interpret(fields)
             return
+        _, _, key, val, currency, account = fields
+        self.wrapper.updateAccountValue(
+            key.decode(), val.decode(), currency.decode(), account.decode())
 
+    def _decodeNextValidId(self, fields):
         # snoop for nextValidId and managedAccounts response,
         # when both are in then the client is ready
-        elif msgId == 9:
-            _, _, validId = fields
-            self._reqIdSeq = int(validId)
-            if self._accounts:
-                self._readyEvent.set()
-        elif msgId == 15:
-            _, _, accts = fields
-            self._accounts = [a for a in accts.decode().split(',') if a]
-            if self._reqIdSeq:
-                self._readyEvent.set()
+        _, _, validId = fields
+        self._reqIdSeq = int(validId)
+        if self._accounts:
+            self._readyEvent.set()
+        self.decoder.interpret(fields)
 
+    def _decodeExecDetails(self, fields):
+        # the executions create the ib_insync objects directly, with one
+        # contract object that is shared by all executions of the same
+        # contract and with interned strings, to keep the memory
+        # footprint low for accounts with many executions
+        _, reqId, orderId, *contractFields = fields[:14]
+        key = tuple(contractFields)
+        contract = self._execContracts.get(key)
+        if contract is None:
+            (conId, symbol, secType, lastTradeDate, strike, right,
+                multiplier, exchange, currency, localSymbol,
+                tradingClass) = (f.decode() for f in contractFields)
+            contract = Contract.create(
+                conId=int(conId or 0), symbol=symbol, secType=secType,
+                lastTradeDateOrContractMonth=lastTradeDate,
+                strike=float(strike or 0), right=right,
+                multiplier=multiplier, exchange=exchange, currency=currency,
+                localSymbol=localSymbol, tradingClass=tradingClass)
+            self._execContracts[key] = contract
+        (execId, time, acctNumber, exchange, side, shares, price, permId,
+            clientId, liquidation, cumQty, avgPrice, orderRef, evRule,
+            evMultiplier, modelCode, lastLiquidity) = fields[14:]
+        intern = sys.intern
+        execution = Execution(
+            execId=execId.decode(),
+            time=time.decode(),
+            acctNumber=intern(acctNumber.decode()),
+            exchange=intern(exchange.decode()),
+            side=intern(side.decode()),
+            shares=float(shares or 0),
+            price=float(price or 0),
+            permId=int(permId or 0),
+            clientId=int(clientId or 0),
+            orderId=int(orderId or 0),
+            liquidation=int(liquidation or 0),
+            cumQty=float(cumQty or 0),
+            avgPrice=float(avgPrice or 0),
+            orderRef=intern(orderRef.decode()),
+            evRule=intern(evRule.decode()),
+            evMultiplier=float(evMultiplier or 0),
+            modelCode=intern(modelCode.decode()),
+            lastLiquidity=int(lastLiquidity or 0))
+        self.wrapper.execDetails(int(reqId), contract, execution)
+
+    def _decodeUpdateMktDepth(self, fields):
+        _, _, reqId, position, operation, side, price, size = fields
+        self.wrapper.updateMktDepth(
+            int(reqId), int(position),
+            int(operation), int(side), float(price), int(size))
+
+    def _decodeUpdateMktDepthL2(self, fields):
+        _, _, reqId, position, marketMaker, operation, side, price, size, \
+            *isSmartDepth = fields
+        self.wrapper.updateMktDepthL2(
+            int(reqId), int(position), marketMaker.decode(),
+            int(operation), int(side), float(price), int(size),
+            bool(int(isSmartDepth[0] or 0)) if isSmartDepth else False)
+
+    def _decodeManagedAccounts(self, fields):
+        _, _, accts = fields
+        self._accounts = [a for a in accts.decode().split(',') if a]
+        if self._reqIdSeq:
+            self._readyEvent.set()
         self.decoder.interpret(fields)
 
+    def _decodeTickOptionComputation(self, fields):
+        if len(fields) != 12 or int(fields[1]) < 6:
+            self.decoder.interpret(fields)
+            return
+        (_, _, reqId, tickType, impliedVol, delta, optPrice, pvDividend,
+            gamma, vega, theta, undPrice) = (
+                fields[:4] + [float(f or 0) for f in fields[4:]])
+        # negative values are the "not computed" indicators
+        self.wrapper.tickOptionComputation(
+            int(reqId), int(tickType),
+            None if impliedVol < 0 else impliedVol,
+            None if delta == -2 else delta,
+            None if optPrice == -1 else optPrice,
+            None if pvDividend == -1 else pvDividend,
+            None if gamma == -2 else gamma,
+            None if vega == -2 else vega,
+            None if theta == -2 else theta,
+            None if undPrice == -1 else undPrice)
+
+    def _decodeTickGeneric(self, fields):
+        _, _, reqId, tickType, value = fields
+        self.wrapper.tickGeneric(int(reqId), int(tickType), float(value))
+
+    def _decodeTickString(self, fields):
+        _, _, reqId, tickType, value = fields
+        self.wrapper.tickString(int(reqId), int(tickType), value.decode())
+
+    def _decodeCommissionReport(self, fields):
+        (_, _, execId, commission, currency, realizedPNL, yield_,
+            yieldRedemptionDate) = fields
+        cr = ibapi.commission_report.CommissionReport()
+        cr.execId = execId.decode()
+        cr.commission = float(commission or 0)
+        cr.currency = currency.decode()
+        cr.realizedPNL = float(realizedPNL or 0)
+        cr.yield_ = float(yield_ or 0)
+        cr.yieldRedemptionDate = int(yieldRedemptionDate or 0)
+        self.wrapper.commissionReport(cr)
+
+    def _decodeTickByTick(self, fields):
+        _, reqId, tickType, time, *values = fields
+        reqId = int(reqId)
+        tickType = int(tickType)
+        time = int(time)
+        if tickType in (1, 2):
+            # Last or AllLast
+            price, size, mask, exchange, specialConditions = values
+            mask = int(mask)
+            attribs = TickAttribLast(
+                pastLimit=mask & 1 != 0, unreported=mask & 2 != 0)
+            self.wrapper.tickByTickAllLast(
+                reqId, tickType, time, float(price), int(size), attribs,
+                exchange.decode(), specialConditions.decode())
+        elif tickType == 3:
+            # BidAsk
+            bidPrice, askPrice, bidSize, askSize, mask = values
+            mask = int(mask)
+            attribs = TickAttribBidAsk(
+                bidPastLow=mask & 1 != 0, askPastHigh=mask & 2 != 0)
+            self.wrapper.tickByTickBidAsk(
+                reqId, time, float(bidPrice), float(askPrice),
+                int(bidSize), int(askSize), attribs)
+        elif tickType == 4:
+            # MidPoint
+            midPoint, = values
+            self.wrapper.tickByTickMidPoint(reqId, time, float(midPoint))
+
 
 class Connection:
     """
@@ -405,6 +592,9 @@ class Connection:
         self.hasError = None
         self.hasData = None
 
+        # optional recorder that gets all received data
+        self.recorder = None
+
     def _onConnectionCreated(self, future):
         if not future.exception():
             _, self.socket = future.result()
@@ -451,6 +641,9 @@ class Socket(asyncio.Protocol):
             self.connection.disconnected()
 
     def data_received(self, data):
+        recorder = self.connection.recorder
+        if recorder:
+            recorder.write(data)
         self.connection.hasData(data)
 
 
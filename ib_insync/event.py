@@ -1,7 +1,11 @@
 import types
+import asyncio
 import weakref
 
-__all__ = ['Event']
+import eventkit
+from eventkit.util import get_event_loop
+
+__all__ = ['Event', 'FastEvent']
 
 
 class Event:
@@ -144,3 +148,154 @@ class Event:
             if slot[1] is ref:
                 slot[0] = slot[1] = slot[2] = None
         self.slots = [s for s in self.slots if s != [None, None, None]]
+
+
+class FastEvent(eventkit.Event):
+    """
+    :class:`eventkit.Event` that keeps an index of its slots keyed by
+    (object id, function), so that connect, disconnect and ``in`` are
+    lookups instead of scans and rebuilds of the list of slots.
+
+    The slots to emit to are prepared once after a change instead of
+    being copied on every emit. When all slots are plain functions with
+    strong references, emit calls them without the weakref and
+    bound object handling. Slots that are disconnected during an emit
+    are still skipped.
+
+    It is used for the events of tickers and trades, of which there
+    can be thousands per session.
+    """
+
+    __slots__ = ('_index', '_emitSlots', '_plain')
+
+    def __init__(self, name='', _with_error_done_events=True):
+        eventkit.Event.__init__(self, name, _with_error_done_events)
+        self._slots = {}  # id(slot) -> [obj, weakref, func, key]
+        self._index = {}  # (id(obj), func) -> list of slots
+        self._emitSlots = ()
+        self._plain = True
+
+    @staticmethod
+    def init(obj, event_names):
+        for name in event_names:
+            setattr(obj, name, FastEvent(name))
+
+    def connect(self, listener, error=None, done=None, keep_ref=False):
+        if isinstance(listener, eventkit.Op):
+            listener.set_source(self)
+            return self
+        obj, func = self._split(listener)
+        key = (id(obj), func)
+        slot = [obj, None, func, key]
+        if not keep_ref and hasattr(obj, '__weakref__'):
+            slot[0] = None
+            slot[1] = weakref.ref(obj, lambda _ref: self._remove(slot))
+        self._slots[id(slot)] = slot
+        slots = self._index.get(key)
+        if slots is None:
+            self._index[key] = [slot]
+        else:
+            slots.append(slot)
+        self._emitSlots = None
+        if self.done_event and done is not None:
+            self.done_event.connect(done)
+        if self.error_event and error is not None:
+            self.error_event.connect(error)
+        return self
+
+    def disconnect(self, listener, error=None, done=None):
+        obj, func = self._split(listener)
+        slots = self._index.get((id(obj), func))
+        if slots:
+            self._remove(slots[0])
+        if error is not None:
+            self.error_event.disconnect(error)
+        if done is not None:
+            self.done_event.disconnect(done)
+        return self
+
+    def disconnect_obj(self, obj):
+        objId = id(obj)
+        for key in [key for key in self._index if key[0] == objId]:
+            for slot in list(self._index.get(key, ())):
+                self._remove(slot)
+        if self.error_event is not None:
+            self.error_event.disconnect_obj(obj)
+        if self.done_event is not None:
+            self.done_event.disconnect_obj(obj)
+
+    def clear(self):
+        for slot in self._slots.values():
+            slot[0] = slot[1] = slot[2] = None
+        self._slots = {}
+        self._index = {}
+        self._emitSlots = ()
+        self._plain = True
+
+    def emit(self, *args):
+        self._value = args
+        slots = self._emitSlots
+        if slots is None:
+            slots = self._prepare()
+        plain = self._plain
+        for obj, ref, func, _ in slots:
+            try:
+                if plain:
+                    if func is None:
+                        # disconnected during this emit
+                        continue
+                    result = func(*args)
+                else:
+                    if ref:
+                        obj = ref()
+                    result = None
+                    if obj is None:
+                        if func:
+                            result = func(*args)
+                    elif func:
+                        result = func(obj, *args)
+                    else:
+                        result = obj(*args)
+                if result and hasattr(result, '__await__'):
+                    asyncio.ensure_future(result, loop=get_event_loop())
+            except Exception as error:
+                if len(self.error_event):
+                    self.error_event.emit(self, error)
+                else:
+                    eventkit.Event.logger.exception(
+                        f'Value {args} caused exception for event {self}')
+
+    def _prepare(self):
+        slots = self._emitSlots = tuple(self._slots.values())
+        self._plain = all(
+            slot[0] is None and slot[1] is None for slot in slots)
+        return slots
+
+    def _remove(self, slot):
+        if self._slots.pop(id(slot), None) is None:
+            return
+        slots = self._index[slot[3]]
+        for i, s in enumerate(slots):
+            if s is slot:
+                del slots[i]
+                break
+        if not slots:
+            del self._index[slot[3]]
+        slot[0] = slot[1] = slot[2] = None
+        self._emitSlots = None
+
+    def _onFinalize(self, ref):
+        for slot in list(self._slots.values()):
+            if slot[1] is ref:
+                self._remove(slot)
+
+    __iadd__ = connect
+    __isub__ = disconnect
+    __call__ = emit
+
+    def __repr__(self):
+        return f'Event<{self.name()}, {list(self._slots.values())}>'
+
+    def __contains__(self, c):
+        obj, func = self._split(c)
+        return (id(obj), func) in self._index
@@ -1,6 +1,13 @@
+import os
+import re
 import time
+import asyncio
+import hashlib
 import logging
+import datetime
 from contextlib import suppress
+from collections import defaultdict
+from typing import Iterator
 from urllib.request import urlopen
 import xml.etree.ElementTree as et
 
@@ -11,6 +18,18 @@ __all__ = ('FlexReport', 'FlexError')
 
 _logger = logging.getLogger('ib_insync.flexreport')
 
+_chunkSize = 1 << 16
+_statementStart = b'<FlexQueryResponse'
+_sampleSize = 100
+_dateNameEndings = ('date', 'datetime', 'expiry')
+_dateRegex = re.compile(
+    r'(\d{4})-?(\d{2})-?(\d{2})(?:[; ,](\d{2}):?(\d{2}):?(\d{2}))?$')
+nan = float('nan')
+_topicClasses = {}
+_headSize = 1024
+# statement generation in progress, too many requests
+_retryErrorCodes = ('1019', '1018')
+
 
 class FlexError(Exception):
     pass
@@ -32,8 +51,24 @@ class FlexReport:
 
     A large query can take a few minutes. In the weekends the query servers
     can be down.
+
+    Large reports can be processed in constant memory with
+    :meth:`.stream`, directly from file or from the download stream
+    given by :meth:`.openStatement`.
+
+    Several reports can be downloaded concurrently with
+    :meth:`.downloadMany`, optionally with a cache on disk.
+
+    Attributes:
+      BaseUrl (str):
+        URL of the Flex Web Service request; It can be set to a
+        different server, such as a local stub for testing.
     """
 
+    BaseUrl = (
+        'https://gdcdyn.interactivebrokers.com'
+        '/Universal/servlet/FlexStatementService.SendRequest')
+
     def __init__(self, token=None, queryId=None, path=None):
         """
         Download a report by giving a valid ``token`` and ``queryId``,
@@ -58,60 +93,255 @@ class FlexReport:
 
         The topic is a string like TradeConfirm, ChangeInDividendAccrual,
         Order, etc.
+
+        With ``parseNumbers`` the type of every attribute is inferred
+        from the first items: Attributes that are all int or all float
+        are converted to that type, other attributes are left as string.
         """
-        cls = type(topic, (DynamicObject,), {})
-        results = [cls(**node.attrib) for node in self.root.iter(topic)]
+        cls = _topicClass(topic)
+        attribs = [node.attrib for node in self.root.iter(topic)]
         if parseNumbers:
-            for obj in results:
-                d = obj.__dict__
-                for k, v in d.items():
-                    with suppress(ValueError):
-                        d[k] = float(v)
-                        d[k] = int(v)
-        return results
+            parse = _createParser(attribs[:_sampleSize])
+            return [cls(**parse(attrib)) for attrib in attribs]
+        else:
+            return [cls(**attrib) for attrib in attribs]
 
-    def df(self, topic: str, parseNumbers=True):
+    @staticmethod
+    def stream(source, topic: str, parseNumbers=True) -> Iterator:
         """
-        Same as extract but return the result as a pandas DataFrame.
+        Streaming version of :meth:`.extract` that parses the XML
+        incrementally and yields the items of the given topic.
+        Parsed elements are discarded as it goes, so that a report
+        of any size is processed in constant memory.
+
+        Args:
+            source: Path of an XML file, or file-like object such as an
+                open file or the response from :meth:`.openStatement`.
+            topic: Topic of the items, such as TradeConfirm.
+            parseNumbers: Convert numeric values to float or int.
+        """
+        cls = _topicClass(topic)
+        parse = None
+        samples = []
+        parser = et.XMLPullParser(('start', 'end'))
+        stack = []
+        f = open(source, 'rb') if isinstance(source, str) else source
+        try:
+            while True:
+                chunk = f.read(_chunkSize)
+                if not chunk:
+                    break
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    if event == 'start':
+                        stack.append(elem)
+                        continue
+                    stack.pop()
+                    if elem.tag == topic:
+                        if not parseNumbers:
+                            yield cls(**elem.attrib)
+                        elif parse:
+                            yield cls(**parse(elem.attrib))
+                        else:
+                            # hold back the first items to infer the types
+                            samples.append(elem.attrib)
+                            if len(samples) == _sampleSize:
+                                parse = _createParser(samples)
+                                yield from (
+                                    cls(**parse(s)) for s in samples)
+                    if stack:
+                        # the parent only ever holds the one child
+                        stack[-1].remove(elem)
+            parser.close()
+            if samples and not parse:
+                parse = _createParser(samples)
+                yield from (cls(**parse(s)) for s in samples)
+        finally:
+            if f is not source:
+                f.close()
+
+    def columns(
+            self, topic: str, parseNumbers=True, parseDates=False,
+            arrays=False) -> dict:
         """
-        return util.df(self.extract(topic, parseNumbers))
+        Extract the items of given topic as columns, without creating
+        an object per item. Return a dictionary of attribute name to
+        the list of values, with '' for missing values.
+
+        Args:
+            topic: Topic of the items, such as TradeConfirm.
+            parseNumbers: Convert the numeric attributes,
+                with the types inferred as in :meth:`.extract`.
+            parseDates: Convert the date attributes (the ones named
+                like ``tradeDate``, ``dateTime`` or ``expiry``) that are
+                in a format like 20190102 or 20190102;103000
+                to ``datetime.date`` or ``datetime.datetime``.
+            arrays: Return the columns as NumPy arrays: int64 or float64
+                for numbers (with NaN for missing values),
+                datetime64 for dates and object for the rest.
+        """
+        attribs = [node.attrib for node in self.root.iter(topic)]
+        names = {}
+        for attrib in attribs:
+            names.update(attrib)
+        columns = {k: [a.get(k, '') for a in attribs] for k in names}
+        samples = attribs[:_sampleSize]
+        converters = _inferConverters(samples) if parseNumbers else {}
+        for k, values in columns.items():
+            if parseDates and _isDateColumn(k, samples):
+                columns[k] = _dateColumn(values, arrays)
+            elif parseNumbers:
+                columns[k] = _numberColumn(
+                    values, converters.get(k, _parseNumber), arrays)
+            elif arrays:
+                columns[k] = _objectArray(values)
+        return columns
+
+    def df(self, topic: str, parseNumbers=True, parseDates=False):
+        """
+        Same as extract but return the result as a pandas DataFrame,
+        that is created at once from the typed columns as given by
+        :meth:`.columns`.
+        """
+        import pandas as pd
+        columns = self.columns(topic, parseNumbers, parseDates, arrays=True)
+        return pd.DataFrame(columns) if columns else None
+
+    def saveColumns(
+            self, topic: str, path: str, parseNumbers=True, parseDates=True):
+        """
+        Save the items of given topic to a columnar file, Parquet if
+        ``path`` ends with .parquet, else Arrow IPC (Feather).
+        The pyarrow package is required for this.
+        """
+        import pyarrow as pa
+        columns = self.columns(topic, parseNumbers, parseDates, arrays=True)
+        table = pa.table({
+            k: v.astype(str) if v.dtype == object else v
+            for k, v in columns.items()})
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            pq.write_table(table, path)
+        else:
+            import pyarrow.feather as feather
+            feather.write_feather(table, path)
 
     def download(self, token, queryId):
         """
         Download report for the given ``token`` and ``queryId``.
         """
-        url = (
-                'https://gdcdyn.interactivebrokers.com'
-                f'/Universal/servlet/FlexStatementService.SendRequest?'
-                f't={token}&q={queryId}&v=3')
-        resp = urlopen(url)
-        data = resp.read()
-
-        root = et.fromstring(data)
-        if root.find('Status').text == 'Success':
-            code = root.find('ReferenceCode').text
-            baseUrl = root.find('Url').text
-            _logger.info('Statement is being prepared...')
-        else:
-            errorCode = root.find('ErrorCode').text
-            errorMsg = root.find('ErrorMessage').text
-            raise FlexError(f'{errorCode}: {errorMsg}')
+        with self.openStatement(token, queryId) as f:
+            self.data = f.read()
+        self.root = et.fromstring(self.data)
+
+    @classmethod
+    def openStatement(cls, token, queryId, fromDate=None, toDate=None):
+        """
+        Request the report for the given ``token`` and ``queryId``
+        and return the file-like response stream of the statement,
+        once it has been prepared. Use it with :meth:`.stream`
+        to process the statement while it downloads.
 
+        Optionally the period of the report can be given with
+        ``fromDate`` and ``toDate`` (date or 'yyyymmdd' string).
+        """
+        url = cls._requestUrl(token, queryId, fromDate, toDate)
+        with urlopen(url) as resp:
+            code, baseUrl = _parseRequestResponse(resp.read())
         while True:
             time.sleep(1)
             url = f'{baseUrl}?q={code}&t={token}'
             resp = urlopen(url)
-            self.data = resp.read()
-            self.root = et.fromstring(self.data)
-            if self.root[0].tag == 'code':
-                msg = self.root[0].text
-                if msg.startswith('Statement generation in progress'):
-                    _logger.info('still working...')
+            # a statement has a FlexQueryResponse at the start, anything
+            # else is a short message; read the start to tell them apart
+            head = b''
+            while len(head) < _headSize:
+                chunk = resp.read(_headSize - len(head))
+                if not chunk:
+                    break
+                head += chunk
+            if _statementStart not in head:
+                head += resp.read()
+                resp.close()
+                if not _isStatementReady(head):
                     continue
-                else:
-                    raise FlexError(msg)
             break
         _logger.info('Statement retrieved.')
+        return _PrefixedStream(head, resp)
+
+    @classmethod
+    async def downloadAsync(
+            cls, token, queryId, fromDate=None, toDate=None,
+            cacheDir=None, maxDelay=30) -> 'FlexReport':
+        """
+        Coroutine to download the report for the given ``token`` and
+        ``queryId``. While the statement is being prepared it is polled
+        with exponential backoff, up to ``maxDelay`` seconds.
+
+        When a ``cacheDir`` is given, the statement is stored there
+        and a repeated download on the same day, for the same
+        token, query and period, is loaded from the cache.
+        """
+        path = None
+        if cacheDir:
+            key = '|'.join(str(v) for v in (
+                token, queryId, fromDate, toDate, datetime.date.today()))
+            name = hashlib.sha256(key.encode()).hexdigest()[:32]
+            path = os.path.join(cacheDir, f'{name}.xml')
+            if os.path.exists(path):
+                _logger.info(f'Query {queryId} loaded from cache')
+                return cls(path=path)
+
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(
+            None, _read, cls._requestUrl(token, queryId, fromDate, toDate))
+        code, baseUrl = _parseRequestResponse(data)
+        delay = 1
+        while True:
+            await asyncio.sleep(delay)
+            data = await loop.run_in_executor(
+                None, _read, f'{baseUrl}?q={code}&t={token}')
+            if _isStatementReady(data):
+                break
+            delay = min(2 * delay, maxDelay)
+        _logger.info(f'Query {queryId} retrieved')
+
+        report = cls()
+        report.data = data
+        report.root = et.fromstring(data)
+        if path:
+            os.makedirs(cacheDir, exist_ok=True)
+            report.save(path + '.tmp')
+            os.replace(path + '.tmp', path)
+        return report
+
+    @classmethod
+    async def downloadManyAsync(cls, token, queryIds, **kwargs) -> list:
+        """
+        Coroutine to download the reports for all of the ``queryIds``
+        concurrently. The keyword arguments are as for
+        :meth:`.downloadAsync`.
+        """
+        return list(await asyncio.gather(
+            *(cls.downloadAsync(token, q, **kwargs) for q in queryIds)))
+
+    @classmethod
+    def downloadMany(cls, token, queryIds, **kwargs) -> list:
+        """
+        Download the reports for all of the ``queryIds`` concurrently
+        and return them as a list of reports.
+        The keyword arguments are as for :meth:`.downloadAsync`.
+        """
+        return util.run(cls.downloadManyAsync(token, queryIds, **kwargs))
+
+    @classmethod
+    def _requestUrl(cls, token, queryId, fromDate, toDate):
+        url = f'{cls.BaseUrl}?t={token}&q={queryId}&v=3'
+        if fromDate:
+            url += f'&fd={_formatDate(fromDate)}'
+        if toDate:
+            url += f'&td={_formatDate(toDate)}'
+        return url
 
     def load(self, path):
         """
@@ -129,6 +359,241 @@ class FlexReport:
             f.write(self.data)
 
 
+def _read(url):
+    with urlopen(url) as resp:
+        return resp.read()
+
+
+def _formatDate(d):
+    return d.strftime('%Y%m%d') if isinstance(d, datetime.date) else d
+
+
+def _parseRequestResponse(data):
+    """
+    Get the reference code and the URL of the statement from
+    the response to the statement request.
+    """
+    root = et.fromstring(data)
+    if root.find('Status').text == 'Success':
+        code = root.find('ReferenceCode').text
+        baseUrl = root.find('Url').text
+        _logger.info('Statement is being prepared...')
+    else:
+        errorCode = root.find('ErrorCode').text
+        errorMsg = root.find('ErrorMessage').text
+        raise FlexError(f'{errorCode}: {errorMsg}')
+    return code, baseUrl
+
+
+def _isStatementReady(data):
+    """
+    Is the statement response the statement, or a message that the
+    statement is still being generated? Raise FlexError on other
+    messages.
+    """
+    if _statementStart in data[:_headSize]:
+        return True
+    root = et.fromstring(data)
+    if root[0].tag == 'code':
+        msg = root[0].text
+        if msg.startswith('Statement generation in progress'):
+            _logger.info('still working...')
+            return False
+        raise FlexError(msg)
+    errorCode = root.find('ErrorCode')
+    if errorCode is not None:
+        if errorCode.text in _retryErrorCodes:
+            _logger.info('still working...')
+            return False
+        errorMsg = root.find('ErrorMessage')
+        raise FlexError(
+            f'{errorCode.text}: '
+            f'{errorMsg.text if errorMsg is not None else ""}')
+    return True
+
+
+def _topicClass(topic):
+    """
+    Get the class for the items of the given topic.
+    """
+    cls = _topicClasses.get(topic)
+    if cls is None:
+        cls = _topicClasses[topic] = type(topic, (DynamicObject,), {})
+    return cls
+
+
+def _parseNumber(v):
+    """
+    Convert string to int or float if possible.
+    """
+    try:
+        f = float(v)
+    except ValueError:
+        return v
+    try:
+        return int(v)
+    except ValueError:
+        return f
+
+
+def _toInt(v):
+    try:
+        return int(v)
+    except ValueError:
+        return _parseNumber(v)
+
+
+def _toFloat(v):
+    try:
+        return float(v)
+    except ValueError:
+        return _parseNumber(v)
+
+
+def _inferConverters(samples):
+    """
+    Get the dictionary of attribute name to converter, as inferred from
+    the non-empty values of the samples: ``_toInt``, ``_toFloat`` or None
+    for attributes that are left as string.
+    """
+    values = defaultdict(set)
+    for attrib in samples:
+        for k, v in attrib.items():
+            if v:
+                values[k].add(v)
+    converters = {}
+    for k, vs in values.items():
+        for conv in (int, float):
+            with suppress(ValueError):
+                for v in vs:
+                    conv(v)
+                converters[k] = _toInt if conv is int else _toFloat
+                break
+        else:
+            converters[k] = None
+    return converters
+
+
+def _createParser(samples):
+    """
+    Create the function that converts the attributes of an item to
+    their types, as inferred from the non-empty values of the samples.
+    Attributes that are not in the samples, or that only have empty
+    values there, are converted per value.
+    """
+    converters = _inferConverters(samples)
+    get = converters.get
+    known = converters.keys()
+    numeric = [(k, conv) for k, conv in converters.items() if conv]
+
+    def parse(attrib):
+        d = dict(attrib)
+        if d.keys() <= known:
+            for k, conv in numeric:
+                v = d.get(k)
+                if v:
+                    d[k] = conv(v)
+        else:
+            for k, v in attrib.items():
+                conv = get(k, _parseNumber)
+                if conv:
+                    d[k] = conv(v)
+        return d
+
+    return parse
+
+
+def _isDateColumn(name, samples):
+    """
+    Is the attribute a date, going by its name and sampled values?
+    """
+    if not name.lower().endswith(_dateNameEndings):
+        return False
+    values = [s[name] for s in samples if s.get(name)]
+    return bool(values) and all(_dateRegex.match(v) for v in values)
+
+
+def _parseDate(s):
+    m = _dateRegex.match(s)
+    if not m:
+        return s
+    y, mo, d, h, mi, sec = m.groups()
+    if h is None:
+        return datetime.date(int(y), int(mo), int(d))
+    return datetime.datetime(
+        int(y), int(mo), int(d), int(h), int(mi), int(sec))
+
+
+def _dateColumn(values, arrays):
+    if not arrays:
+        return [_parseDate(v) if v else v for v in values]
+    import numpy as np
+    iso = []
+    for v in values:
+        m = _dateRegex.match(v)
+        if m:
+            y, mo, d, h, mi, sec = m.groups()
+            iso.append(
+                f'{y}-{mo}-{d}T{h}:{mi}:{sec}' if h else f'{y}-{mo}-{d}')
+        else:
+            iso.append('NaT')
+    return np.array(iso, dtype='datetime64[s]')
+
+
+def _numberColumn(values, conv, arrays):
+    if conv:
+        values = [conv(v) if v else v for v in values]
+    if not arrays:
+        return values
+    import numpy as np
+    types = set(map(type, values))
+    if types == {int}:
+        with suppress(OverflowError):
+            return np.array(values, dtype=np.int64)
+    elif types and types <= {int, float, str} and all(
+            v == '' for v in values if type(v) is str):
+        return np.array(
+            [nan if v == '' else v for v in values], dtype=np.float64)
+    return _objectArray(values)
+
+
+def _objectArray(values):
+    import numpy as np
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class _PrefixedStream:
+    """
+    File-like stream that first returns the already read prefix
+    and then continues reading from the underlying stream.
+    """
+
+    def __init__(self, prefix, f):
+        self._prefix = prefix
+        self._f = f
+
+    def read(self, size=-1):
+        prefix = self._prefix
+        if not prefix:
+            return self._f.read(size)
+        if size is None or size < 0:
+            self._prefix = b''
+            return prefix + self._f.read()
+        self._prefix = prefix[size:]
+        return prefix[:size]
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+
 if __name__ == '__main__':
     util.logToConsole()
     report = FlexReport('945692423458902392892687', '272555')
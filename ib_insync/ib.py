@@ -13,6 +13,8 @@ from ib_insync.client import Client
 from ib_insync.wrapper import Wrapper
 from ib_insync.contract import Contract
 from ib_insync.ticker import Ticker
+from ib_insync.tickcapture import TickCapture
+from ib_insync.orderbook import OrderBook
 from ib_insync.order import Order, OrderStatus, Trade, LimitOrder, StopOrder
 from ib_insync.objects import (
     BarList, BarDataList, RealTimeBarList,
@@ -86,6 +88,16 @@ class IB:
         RequestTimeout (float): Timeout (in seconds) to wait for a request
           to finish before raising ``asyncio.TimeoutError``.
           The default value of 0 will wait indefinitely.
+        TickCoalesceTime (float): Time window (in microseconds) to
+          coalesce ticker updates over. The ticks of all packets that
+          arrive within the window are delivered together, with one
+          ``pendingTickersEvent`` and one ``updateEvent`` per ticker.
+          The default value of 0 delivers the ticks of every packet
+          right away.
+        KeepTicks (bool): If False then no :class:`.TickData` is created
+          for the level-1 price, size, RT volume and generic ticks in
+          ``ticker.ticks``, for when only the latest values of the ticker
+          fields are used.
 
     Events:
         * ``connectedEvent`` ():
@@ -183,6 +195,8 @@ class IB:
         'errorEvent', 'timeoutEvent')
 
     RequestTimeout = 0
+    TickCoalesceTime = 0
+    KeepTicks = True
 
     def __init__(self):
         Event.init(self, IB.events)
@@ -208,7 +222,8 @@ class IB:
 
     def connect(
             self, host: str = '127.0.0.1', port: int = 7497,
-            clientId: int = 1, timeout: float = 2):
+            clientId: int = 1, timeout: float = 2,
+            execFilter: ExecutionFilter = None):
         """
         Connect to a running TWS or IB gateway application.
         After the connection is made the client is fully synchronized
@@ -225,8 +240,12 @@ class IB:
             timeout: If establishing the connection takes longer than
                 ``timeout`` seconds then the ``asyncio.TimeoutError`` exception
                 is raised. Set to 0 to disable timeout.
+            execFilter: If specified, only the executions that match the
+                filter are synchronized (for example those after a given
+                time), otherwise all executions of the session are.
         """
-        return self._run(self.connectAsync(host, port, clientId, timeout))
+        return self._run(
+            self.connectAsync(host, port, clientId, timeout, execFilter))
 
     def disconnect(self):
         """
@@ -466,6 +485,16 @@ class IB:
         """
         return self.wrapper.tickers.get(id(contract))
 
+    def orderBook(self, contract: Contract) -> OrderBook:
+        """
+        Get the order book of the given contract, as requested with
+        ``reqMktDepth(contract, orderBook=True)``, or None.
+
+        Args:
+            contract: Contract to get the order book for.
+        """
+        return self.wrapper.orderBooks.get(id(contract))
+
     def tickers(self) -> List[Ticker]:
         """
         Get a list of all tickers.
@@ -1101,7 +1130,8 @@ class IB:
     def reqMktData(
             self, contract: Contract, genericTickList: str = '',
             snapshot: bool = False, regulatorySnapshot: bool = False,
-            mktDataOptions: List[TagValue] = None) -> Ticker:
+            mktDataOptions: List[TagValue] = None,
+            capture: TickCapture = None) -> Ticker:
         """
         Subscribe to tick data or request a snapshot.
         Returns the Ticker that holds the market data. The ticker will
@@ -1147,9 +1177,15 @@ class IB:
                 subscribe to a stream of realtime tick data.
             regulatorySnapshot: Request NBBO snapshot (may incur a fee).
             mktDataOptions: Unknown
+            capture: If given then the ticks are captured in this
+                :class:`.TickCapture` instead of ``ticker.ticks``.
+                The same capture can be given for many contracts.
         """
         reqId = self.client.getReqId()
         ticker = self.wrapper.startTicker(reqId, contract, 'mktData')
+        if capture is not None:
+            self.wrapper.reqId2Capture[reqId] = capture
+            capture.contracts[reqId] = contract
         self.client.reqMktData(
             reqId, contract, genericTickList, snapshot,
             regulatorySnapshot, mktDataOptions)
@@ -1166,6 +1202,7 @@ class IB:
         ticker = self.ticker(contract)
         reqId = self.wrapper.endTicker(ticker, 'mktData')
         if reqId:
+            self.wrapper.reqId2Capture.pop(reqId, None)
             self.client.cancelMktData(reqId)
         else:
             self._logger.error(
@@ -1217,7 +1254,8 @@ class IB:
 
     def reqMktDepth(
             self, contract: Contract, numRows: int = 5,
-            isSmartDepth: bool = False, mktDepthOptions=None) -> Ticker:
+            isSmartDepth: bool = False, mktDepthOptions=None,
+            orderBook: bool = False) -> Ticker:
         """
         Subscribe to market depth data (a.k.a. DOM, L2 or order book).
 
@@ -1229,6 +1267,9 @@ class IB:
                 (5 max).
             isSmartDepth: Consolidate the order book across exchanges.
             mktDepthOptions: Unknown.
+            orderBook: If True then keep the market depth in an
+                :class:`.OrderBook` (see :meth:`.orderBook`) instead of
+                in the ticker.
 
         Returns:
             The Ticker that holds the market depth in ``ticker.domBids``
@@ -1237,6 +1278,12 @@ class IB:
         """
         reqId = self.client.getReqId()
         ticker = self.wrapper.startTicker(reqId, contract, 'mktDepth')
+        if orderBook:
+            book = OrderBook(numRows)
+            self.wrapper.reqId2OrderBook[reqId] = book
+            self.wrapper.orderBooks[id(contract)] = book
+        else:
+            self.wrapper.orderBooks.pop(id(contract), None)
         self.client.reqMktDepth(
             reqId, contract, numRows, isSmartDepth, mktDepthOptions)
         return ticker
@@ -1252,6 +1299,8 @@ class IB:
         ticker = self.ticker(contract)
         reqId = self.wrapper.endTicker(ticker, 'mktDepth')
         if reqId:
+            self.wrapper.reqId2OrderBook.pop(reqId, None)
+            self.wrapper.orderBooks.pop(id(contract), None)
             self.client.cancelMktDepth(reqId, isSmartDepth)
         else:
             self._logger.error(
@@ -1575,7 +1624,8 @@ class IB:
     # now entering the parallel async universe
 
     async def connectAsync(
-            self, host='127.0.0.1', port=7497, clientId=1, timeout=2):
+            self, host='127.0.0.1', port=7497, clientId=1, timeout=2,
+            execFilter=None):
         self.wrapper.clientId = clientId
         await self.client.connectAsync(host, port, clientId, timeout)
         accounts = self.client.getAccounts()
@@ -1583,7 +1633,7 @@ class IB:
             self.reqAccountUpdatesAsync(accounts[0]),
             *(self.reqAccountUpdatesMultiAsync(a) for a in accounts),
             self.reqPositionsAsync(),
-            self.reqExecutionsAsync())
+            self.reqExecutionsAsync(execFilter))
         if clientId == 0:
             # autobind manual orders
             self.reqAutoOpenOrders(True)
@@ -0,0 +1,333 @@
+import time
+import random
+import struct
+import asyncio
+import logging
+import datetime
+
+from ib_insync import util
+
+__all__ = ('MockServer',)
+
+_logger = logging.getLogger('ib_insync.mockserver')
+
+
+class MockServer:
+    """
+    Local stand-in for TWS or IB gateway, for testing and load testing
+    without network or a real TWS.
+
+    It does the API handshake and answers the requests that
+    :meth:`.IB.connect` makes (nextValidId, managedAccounts,
+    account updates, positions, executions and open orders),
+    plus ``reqCurrentTime``, ``reqIds`` and ``reqMktData``.
+
+    Synthetic option executions with their commission reports are
+    generated at ``fillRate`` per second and sent to all connected
+    clients, each execution preceded by the openOrder and orderStatus
+    of its filled order, as if the client had placed the order.
+    They are kept so that ``reqExecutions`` returns them as well.
+    Market data subscriptions get price and size ticks at ``tickRate``
+    per second per subscription.
+
+    .. code-block:: python
+
+        server = MockServer(port=4002, fillRate=10, tickRate=1000)
+        server.start()
+        ib = IB()
+        ib.connect('127.0.0.1', 4002, clientId=1)
+
+    Args:
+        host: Host name or IP address to listen on.
+        port: Port number to listen on.
+        accounts: The managed account names.
+        fillRate: Number of executions per second, 0 to disable.
+        tickRate: Number of ticks per second per market data
+            subscription, 0 to disable.
+        maxBatch: Maximum number of messages that are sent in
+            one go; At high rates the messages are batched
+            to keep up with the rate.
+    """
+
+    ServerVersion = 148
+
+    def __init__(
+            self, host='127.0.0.1', port=4002, accounts=('DU123456',),
+            fillRate=0.0, tickRate=0.0, maxBatch=100):
+        self.host = host
+        self.port = port
+        self.accounts = list(accounts)
+        self.fillRate = fillRate
+        self.tickRate = tickRate
+        self.maxBatch = maxBatch
+        self.sessions = []
+        self.executions = []
+        self.numMsgRecv = 0
+        self.numMsgSent = 0
+        self._server = None
+        self._tasks = []
+        self._execSeq = 0
+        self._random = random.Random(0)
+
+    def start(self):
+        util.run(self.startAsync())
+
+    async def startAsync(self):
+        loop = asyncio.get_event_loop()
+        self._server = await loop.create_server(
+            lambda: _MockSession(self), self.host, self.port)
+        if self.fillRate:
+            self._tasks.append(asyncio.ensure_future(
+                self._generate(self.fillRate, self._sendFills)))
+        if self.tickRate:
+            self._tasks.append(asyncio.ensure_future(
+                self._generate(self.tickRate, self._sendTicks)))
+        _logger.info(f'Listening on {self.host}:{self.port}')
+        return self
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        for session in list(self.sessions):
+            session.transport.close()
+        if self._server:
+            self._server.close()
+            self._server = None
+        _logger.info('Stopped')
+
+    def run(self):
+        """
+        Start the server and serve forever.
+        """
+        self.start()
+        util.run()
+
+    def createExecution(self) -> tuple:
+        """
+        Create a synthetic option execution and return the
+        (contract, execution, commissionReport) fields as
+        used in the execDetails and commissionReport messages.
+        """
+        rnd = self._random
+        self._execSeq += 1
+        strike = 2800 + 5 * rnd.randrange(40)
+        right = rnd.choice('CP')
+        expiry = (datetime.date.today() + datetime.timedelta(
+            days=rnd.randrange(1, 60))).strftime('%Y%m%d')
+        localSymbol = f'SPX   {expiry[2:]}{right}{strike * 1000:08d}'
+        side = rnd.choice(('BOT', 'SLD'))
+        shares = rnd.randrange(1, 10)
+        price = round(rnd.uniform(0.05, 50), 2)
+        execId = f'0000e0d5.{self._execSeq:08x}.01.01'
+        execTime = time.strftime('%Y%m%d  %H:%M:%S')
+        contract = [
+            str(1000000 + self._execSeq), 'SPX', 'OPT', expiry, str(strike),
+            right, '100', 'CBOE', 'USD', localSymbol, 'SPX']
+        execution = [
+            execId, execTime, self.accounts[0], 'CBOE', side, str(shares),
+            str(price), str(self._execSeq), '0', '0', str(shares),
+            str(price), '', '', '', '', '1']
+        commission = [
+            '59', '1', execId, str(round(0.65 * shares, 2)), 'USD',
+            '1.7976931348623157E308', '1.7976931348623157E308', '']
+        return contract, execution, commission
+
+    async def _generate(self, rate, send):
+        # send at the given rate, batching when the loop can't keep up
+        loop = asyncio.get_event_loop()
+        interval = 1 / rate
+        t = loop.time()
+        while True:
+            now = loop.time()
+            n = min(self.maxBatch, max(1, int((now - t) / interval)))
+            t += n * interval
+            if self.sessions:
+                send(n)
+            await asyncio.sleep(max(0, t + interval - loop.time()))
+
+    def _sendFills(self, n):
+        for _ in range(n):
+            contract, execution, commission = self.createExecution()
+            self.executions.append(
+                (time.time(), contract, execution, commission))
+            for session in self.sessions:
+                session.sendOrder(contract, execution)
+                session.sendExecution('-1', contract, execution)
+                session.send(commission)
+
+    def _sendTicks(self, n):
+        rnd = self._random
+        for session in self.sessions:
+            for reqId in session.mktDataReqIds:
+                for _ in range(n):
+                    tickType = rnd.choice('124')
+                    session.send([
+                        '1', '6', reqId, tickType,
+                        str(round(rnd.uniform(1, 100), 2)),
+                        str(rnd.randrange(1, 100)), '0'])
+                    session.send([
+                        '2', '6', reqId, '8', str(rnd.randrange(10000))])
+
+
+class _MockSession(asyncio.Protocol):
+    """
+    Connection of one client to the mock server.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.clientId = None
+        self.mktDataReqIds = set()
+        self._data = bytearray()
+        self._handshakeDone = False
+        self._nextId = 1
+        self._handlers = {
+            71: self._startApi,
+            8: self._reqIds,
+            49: self._reqCurrentTime,
+            6: self._reqAccountUpdates,
+            76: self._reqAccountUpdatesMulti,
+            61: self._reqPositions,
+            7: self._reqExecutions,
+            5: self._reqOpenOrders,
+            16: self._reqOpenOrders,
+            1: self._reqMktData,
+            2: self._cancelMktData}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        if self in self.server.sessions:
+            self.server.sessions.remove(self)
+
+    def send(self, fields):
+        msg = '\0'.join(fields).encode() + b'\0'
+        self.transport.write(struct.pack('>I', len(msg)) + msg)
+        self.server.numMsgSent += 1
+
+    def sendExecution(self, reqId, contract, execution):
+        # every execution is of its own order of this client,
+        # with the permId as orderId
+        execution = list(execution)
+        execution[8] = str(self.clientId)
+        self.send(['11', reqId, execution[7]] + contract + execution)
+
+    def sendOrder(self, contract, execution):
+        """
+        Send the openOrder and orderStatus of the filled order
+        of the execution.
+        """
+        _, _, account, _, side, shares, price, permId, *_ = execution
+        orderId = permId
+        clientId = str(self.clientId)
+        action = 'BUY' if side == 'BOT' else 'SELL'
+        # the order fields that are not used are left empty, with the
+        # order status at its place for the server version
+        self.send(
+            ['5', orderId] + contract + [
+                action, shares, 'LMT', price, '', 'DAY', '', account,
+                'O', '0', '', clientId, permId] +
+            [''] * 60 + ['Filled'] + [''] * 32)
+        self.send([
+            '3', orderId, 'Filled', shares, '0', price, permId, '0',
+            price, clientId, '', '0'])
+
+    def data_received(self, data):
+        buf = self._data
+        buf += data
+        if not self._handshakeDone:
+            # 'API\0' followed by the supported client versions
+            if len(buf) < 8 or len(buf) < 8 + struct.unpack_from(
+                    '>I', buf, 4)[0]:
+                return
+            size = struct.unpack_from('>I', buf, 4)[0]
+            del buf[:8 + size]
+            self._handshakeDone = True
+            self.send([
+                str(self.server.ServerVersion),
+                time.strftime('%Y%m%d %H:%M:%S EST')])
+        while len(buf) >= 4:
+            size = struct.unpack_from('>I', buf)[0]
+            if len(buf) < 4 + size:
+                break
+            fields = bytes(buf[4:4 + size]).decode().split('\0')
+            del buf[:4 + size]
+            fields.pop()
+            self.server.numMsgRecv += 1
+            handler = self._handlers.get(int(fields[0]))
+            if handler:
+                handler(fields)
+            else:
+                _logger.debug(f'Ignoring request {fields}')
+
+    def _startApi(self, fields):
+        _, _, clientId, *_ = fields
+        self.clientId = int(clientId)
+        self.server.sessions.append(self)
+        self.send(['9', '1', str(self._nextId)])
+        self.send(['15', '1', ','.join(self.server.accounts)])
+
+    def _reqIds(self, fields):
+        self.send(['9', '1', str(self._nextId)])
+
+    def _reqCurrentTime(self, fields):
+        self.send(['49', '1', str(int(time.time()))])
+
+    def _reqAccountUpdates(self, fields):
+        _, _, subscribe, account = fields
+        if subscribe == '1':
+            for key, value in (
+                    ('NetLiquidation', '100000.00'),
+                    ('TotalCashValue', '100000.00'),
+                    ('BuyingPower', '400000.00')):
+                self.send(['6', '2', key, value, 'USD', account])
+            self.send(['8', '1', time.strftime('%H:%M')])
+            self.send(['54', '1', account])
+
+    def _reqAccountUpdatesMulti(self, fields):
+        _, _, reqId, account, modelCode, _ = fields
+        self.send([
+            '73', '1', reqId, account, modelCode,
+            'NetLiquidation', '100000.00', 'USD'])
+        self.send(['74', '1', reqId])
+
+    def _reqPositions(self, fields):
+        self.send([
+            '61', '3', self.server.accounts[0], '756733', 'SPY', 'STK', '',
+            '0', '', '', 'ARCA', 'USD', 'SPY', 'SPY', '100', '280.5'])
+        self.send(['62', '1'])
+
+    def _reqExecutions(self, fields):
+        _, _, reqId, _clientId, _acctCode, execTime, *_ = fields
+        since = time.mktime(time.strptime(
+            execTime, '%Y%m%d %H:%M:%S')) if execTime else 0
+        executions = [
+            e for e in self.server.executions if e[0] >= since]
+        for _, contract, execution, _ in executions:
+            self.sendExecution(reqId, contract, execution)
+        self.send(['55', '1', reqId])
+        for *_, commission in executions:
+            self.send(commission)
+
+    def _reqOpenOrders(self, fields):
+        self.send(['53', '1'])
+
+    def _reqMktData(self, fields):
+        reqId = fields[2]
+        snapshot = fields[-3] == '1'
+        rnd = self.server._random
+        for tickType in ('1', '2', '4'):
+            self.send([
+                '1', '6', reqId, tickType,
+                str(round(rnd.uniform(1, 100), 2)),
+                str(rnd.randrange(1, 100)), '0'])
+        if snapshot:
+            self.send(['57', '1', reqId])
+        else:
+            self.mktDataReqIds.add(reqId)
+
+    def _cancelMktData(self, fields):
+        self.mktDataReqIds.discard(fields[2])
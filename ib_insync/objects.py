@@ -1,3 +1,4 @@
+import keyword
 from collections import namedtuple
 
 import ibapi.scanner
@@ -50,6 +51,11 @@ class Object:
     __slots__ = ('__weakref__',)
     defaults: dict = {}
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'defaults' in cls.__dict__:
+            cls._setAttrs = _createSetAttrs(cls.defaults)
+
     def __init__(self, *args, **kwargs):
         """
         Attribute values can be given positionally or as keyword.
@@ -57,10 +63,10 @@ class Object:
         'defaults' class member. If an attribute is given both positionally
         and as keyword, the keyword wins.
         """
-        defaults = self.__class__.defaults
-        d = {**defaults, **dict(zip(defaults, args)), **kwargs}
-        for k, v in d.items():
-            setattr(self, k, v)
+        if args and kwargs:
+            kwargs = {**dict(zip(self.defaults, args)), **kwargs}
+            args = ()
+        self._setAttrs(*args, **kwargs)
 
     def __repr__(self):
         clsName = self.__class__.__qualname__
@@ -116,6 +122,39 @@ class Object:
         return nonDefaults
 
 
+def _createSetAttrs(defaults):
+    """
+    Generate the function that sets the attributes of an Object
+    subclass from positional or keyword values, like dataclasses do:
+    The defaults become parameter defaults and the attributes are
+    set with plain assignments. Positional values beyond the
+    defaults are ignored and other keywords are set as they are.
+    """
+    names = list(defaults)
+    if any(
+            not k.isidentifier() or keyword.iskeyword(k) or
+            k in ('self', '_args', '_kwargs', '_defaults') for k in names):
+        def setAttrs(self, *args, **kwargs):
+            d = {**defaults, **dict(zip(defaults, args)), **kwargs}
+            for k, v in d.items():
+                setattr(self, k, v)
+        return setAttrs
+
+    params = ''.join(f'{k}=_defaults[{k!r}], ' for k in names)
+    body = ''.join(f'    self.{k} = {k}\n' for k in names)
+    src = (
+        f'def setAttrs(self, {params}*_args, **_kwargs):\n'
+        f'{body}'
+        '    for k, v in _kwargs.items():\n'
+        '        setattr(self, k, v)\n')
+    namespace = {'_defaults': defaults}
+    exec(src, namespace)
+    return namespace['setAttrs']
+
+
+Object._setAttrs = _createSetAttrs(Object.defaults)
+
+
 class DynamicObject:
 
     def __init__(self, **kwargs):
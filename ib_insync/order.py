@@ -1,5 +1,5 @@
 import ibapi
-from eventkit import Event
+from .event import FastEvent
 
 from .objects import Object
 
@@ -38,7 +38,7 @@ class Trade(Object):
 
     def __init__(self, *args, **kwargs):
         Object.__init__(self, *args, **kwargs)
-        Event.init(self, Trade.events)
+        FastEvent.init(self, Trade.events)
 
     def isActive(self):
         """
@@ -0,0 +1,172 @@
+import array
+
+from ib_insync.objects import DOMLevel
+
+__all__ = ('OrderBook',)
+
+
+class OrderBookSide:
+    """
+    One side (bids or asks) of an order book, with the levels in
+    preallocated arrays of ``prices``, ``sizes`` and ``marketMakers``.
+    Only the first ``len(side)`` entries are valid.
+    """
+
+    __slots__ = ('prices', 'sizes', 'marketMakers', 'n')
+
+    def __init__(self, capacity):
+        capacity = max(capacity, 1)
+        self.prices = array.array('d', bytes(8 * capacity))
+        self.sizes = array.array('d', bytes(8 * capacity))
+        self.marketMakers = [''] * capacity
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def insert(self, position, price, size, marketMaker):
+        n = self.n
+        if position > n:
+            position = n
+        if n == len(self.prices):
+            self._grow()
+        prices = self.prices
+        sizes = self.sizes
+        marketMakers = self.marketMakers
+        if position < n:
+            prices[position + 1:n + 1] = prices[position:n]
+            sizes[position + 1:n + 1] = sizes[position:n]
+            marketMakers[position + 1:n + 1] = marketMakers[position:n]
+        prices[position] = price
+        sizes[position] = size
+        marketMakers[position] = marketMaker
+        self.n = n + 1
+
+    def update(self, position, price, size, marketMaker):
+        if position >= self.n:
+            self.insert(position, price, size, marketMaker)
+        else:
+            self.prices[position] = price
+            self.sizes[position] = size
+            self.marketMakers[position] = marketMaker
+
+    def delete(self, position):
+        """
+        Delete the level at the position and return its price,
+        or None if there is no such level.
+        """
+        n = self.n
+        if position >= n:
+            return None
+        prices = self.prices
+        price = prices[position]
+        if position < n - 1:
+            prices[position:n - 1] = prices[position + 1:n]
+            self.sizes[position:n - 1] = self.sizes[position + 1:n]
+            self.marketMakers[position:n - 1] = \
+                self.marketMakers[position + 1:n]
+        self.marketMakers[n - 1] = ''
+        self.n = n - 1
+        return price
+
+    def clear(self):
+        self.marketMakers[:self.n] = [''] * self.n
+        self.n = 0
+
+    def levels(self):
+        """
+        Return the levels as list of :class:`.DOMLevel`.
+        """
+        return [
+            DOMLevel(p, s, m) for p, s, m in zip(
+                self.prices[:self.n], self.sizes[:self.n],
+                self.marketMakers[:self.n])]
+
+    def aggregated(self):
+        """
+        Return the levels aggregated by price, as list of
+        (price, size) tuples in book order. This combines the levels
+        of different market makers at the same price, as found with
+        SMART depth.
+        """
+        sizes = {}
+        for price, size in zip(self.prices[:self.n], self.sizes[:self.n]):
+            sizes[price] = sizes.get(price, 0.0) + size
+        return list(sizes.items())
+
+    def _grow(self):
+        n = len(self.prices)
+        self.prices.extend(self.prices)
+        self.sizes.extend(self.sizes)
+        self.marketMakers.extend([''] * n)
+
+
+class OrderBook:
+    """
+    Order book that is kept up to date from market depth updates.
+    The levels are kept in preallocated arrays, so that an update
+    at a position is done in place without creating objects.
+    Inserts and deletes shift the levels below the position in place.
+
+    It is used instead of ``ticker.domBids``, ``ticker.domAsks`` and
+    ``ticker.domTicks`` when requested with
+    ``ib.reqMktDepth(contract, orderBook=True)``, and is then available
+    with :meth:`.IB.orderBook`.
+
+    Args:
+        numRows: Number of levels to preallocate per side.
+    """
+
+    __slots__ = ('bids', 'asks', 'lastTime')
+
+    def __init__(self, numRows=5):
+        self.bids = OrderBookSide(numRows)
+        self.asks = OrderBookSide(numRows)
+        self.lastTime = None
+
+    def __repr__(self):
+        return (
+            f'OrderBook(bids={self.bids.levels()}, '
+            f'asks={self.asks.levels()})')
+
+    def update(self, position, marketMaker, operation, side, price, size):
+        """
+        Apply a market depth update.
+
+        Args:
+            position: Position of the level in the book.
+            marketMaker: Market maker of the level (for L2 depth).
+            operation: 0 = insert, 1 = update, 2 = delete.
+            side: 0 = ask, 1 = bid.
+            price: Price of the level.
+            size: Size of the level.
+        """
+        book = self.bids if side else self.asks
+        if operation == 0:
+            book.insert(position, price, size, marketMaker)
+        elif operation == 1:
+            book.update(position, price, size, marketMaker)
+        elif operation == 2:
+            book.delete(position)
+
+    def clear(self):
+        self.bids.clear()
+        self.asks.clear()
+
+    def snapshot(self):
+        """
+        Return a copy of the book as (bidPrices, bidSizes, askPrices,
+        askSizes) arrays.
+        """
+        bids = self.bids
+        asks = self.asks
+        return (
+            bids.prices[:bids.n], bids.sizes[:bids.n],
+            asks.prices[:asks.n], asks.sizes[:asks.n])
+
+    def aggregated(self):
+        """
+        Return the (bids, asks) levels aggregated by price,
+        see :meth:`.OrderBookSide.aggregated`.
+        """
+        return self.bids.aggregated(), self.asks.aggregated()
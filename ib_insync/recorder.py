@@ -0,0 +1,175 @@
+import time
+import struct
+import asyncio
+import logging
+
+import ibapi.decoder
+
+from ib_insync.client import Client
+from ib_insync import util
+
+__all__ = ('Recorder', 'Replayer')
+
+_logger = logging.getLogger('ib_insync.recorder')
+
+# file starts with a magic marker, followed by the records;
+# each record is a header with the receive time (float seconds since epoch)
+# and the size of the data, followed by the raw data as it arrived
+_magic = b'IBREC1\n'
+_header = struct.Struct('>dI')
+
+
+class Recorder:
+    """
+    Record the raw socket data that is received from TWS or gateway
+    to a file, for later replay with :class:`.Replayer`.
+
+    The recorder is activated by setting it as the ``recorder`` attribute
+    of the client before connecting:
+
+    .. code-block:: python
+
+        ib = IB()
+        ib.client.recorder = Recorder('session.rec')
+        ib.connect('127.0.0.1', 7497, clientId=1)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(_magic)
+        self.numBytes = 0
+        self.numRecords = 0
+
+    def write(self, data):
+        """
+        Append the received data with the current time.
+        """
+        self._file.write(_header.pack(time.time(), len(data)))
+        self._file.write(data)
+        self.numBytes += len(data)
+        self.numRecords += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            _logger.info(
+                f'Recorded {self.numRecords} packets, '
+                f'{self.numBytes} bytes to {self.path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+
+class _NullConnection:
+    """
+    Stand-in for the TWS connection during replay;
+    Requests that the client sends are discarded.
+    """
+    numBytesSent = 0
+    numMsgSent = 0
+    recorder = None
+
+    def sendMsg(self, msg):
+        self.numBytesSent += len(msg)
+        self.numMsgSent += 1
+
+    def isConnected(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+
+class Replayer:
+    """
+    Replay a file written by :class:`.Recorder` through a client.
+
+    The data is fed packet by packet to ``Client._onSocketHasData``
+    exactly as it arrived from the socket, so that the client, wrapper
+    and everything that listens to its events runs the same as in the
+    recorded session, without TWS being needed. Requests that
+    the client makes during replay are discarded.
+
+    .. code-block:: python
+
+        ib = IB()
+        Replayer('session.rec').replay(ib.client)
+        print(ib.fills())
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        """
+        Iterate over the records as (time, data) tuples.
+        """
+        with open(self.path, 'rb') as f:
+            if f.read(len(_magic)) != _magic:
+                raise ValueError(f'{self.path} is not a recording')
+            while True:
+                header = f.read(_header.size)
+                if len(header) < _header.size:
+                    break
+                t, size = _header.unpack(header)
+                data = f.read(size)
+                if len(data) < size:
+                    _logger.warning(f'{self.path}: Truncated last record')
+                    break
+                yield t, data
+
+    def replay(self, client: Client, realTime: bool = False) -> int:
+        """
+        Replay the recording and return the number of packets replayed.
+
+        Args:
+            client: The client to feed the data to, for example ``ib.client``.
+            realTime: If False then replay at full speed, if True then
+                replay with the same timing as the recording, while
+                the event loop keeps running.
+        """
+        if realTime:
+            return util.run(self.replayAsync(client, realTime))
+        self._startReplay(client)
+        n = 0
+        for _, data in self:
+            client._onSocketHasData(data)
+            n += 1
+        return n
+
+    async def replayAsync(
+            self, client: Client, realTime: bool = True) -> int:
+        self._startReplay(client)
+        loop = asyncio.get_event_loop()
+        n = 0
+        start = None
+        for t, data in self:
+            if realTime:
+                if start is None:
+                    start = loop.time() - t
+                delay = start + t - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+            client._onSocketHasData(data)
+            n += 1
+        return n
+
+    def _startReplay(self, client):
+        # put the client in the state it is in directly after the
+        # socket has connected, waiting for the handshake response
+        client.reset()
+        if client.clientId is None:
+            client.host, client.port, client.clientId = self.path, 0, 0
+        client.setConnState(Client.CONNECTING)
+        client.conn = _NullConnection()
+        client.decoder = ibapi.decoder.Decoder(client.wrapper, None)
+        _logger.info(f'Replaying {self.path}')
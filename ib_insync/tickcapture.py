@@ -0,0 +1,133 @@
+import struct
+import logging
+
+__all__ = ('TickCapture',)
+
+_logger = logging.getLogger('ib_insync.tickcapture')
+
+# ticks are stored as packed little-endian records, with the same
+# layout in memory and on disk
+_record = struct.Struct('<dihdq')
+_dtype = [
+    ('time', '<f8'), ('reqId', '<i4'), ('tickType', '<i2'),
+    ('price', '<f8'), ('size', '<i8')]
+
+
+class TickCapture:
+    """
+    Capture the level-1 ticks of tickers into preallocated buffers,
+    instead of creating a :class:`.TickData` for every tick in
+    ``ticker.ticks``. Each tick is stored as a packed record of
+    time (float64 seconds since epoch), reqId (int32) of the market
+    data request, tickType (int16), price (float64) and size (int64).
+
+    One capture can be used for many tickers, such as all strikes of
+    an option chain. The contract of every reqId is kept in
+    ``contracts``.
+
+    The ticks are gathered in chunks of ``chunkSize`` ticks. A finished
+    chunk is appended to the file at ``path`` (if given) or else kept
+    in memory, and the buffer is reused for the next chunk.
+
+    .. code-block:: python
+
+        capture = TickCapture('spx.ticks')
+        for contract in chain:
+            ib.reqMktData(contract, capture=capture)
+        ...
+        for contract in chain:
+            ib.cancelMktData(contract)
+        capture.close()
+        ticks = TickCapture.load('spx.ticks')
+        print(ticks['reqId'], ticks['price'])
+
+    The tickers themselves (bid, ask, last, etc.) are updated as usual.
+    NumPy is needed for :meth:`.view`, :meth:`.array` and :meth:`.load`.
+
+    Args:
+        path: File to write the finished chunks to.
+        chunkSize: Number of ticks per chunk.
+    """
+
+    def __init__(self, path=None, chunkSize=65536):
+        self.path = path
+        self.chunkSize = chunkSize
+        self.numTicks = 0
+        self.contracts = {}  # reqId -> Contract
+        self.chunks = []  # finished chunks if there's no file
+        self._buf = bytearray(chunkSize * _record.size)
+        self._n = 0
+        self._file = open(path, 'wb') if path else None
+
+    def __len__(self):
+        return self.numTicks + self._n
+
+    def add(self, time, reqId, tickType, price, size):
+        """
+        Add a tick.
+        """
+        _record.pack_into(
+            self._buf, self._n * _record.size,
+            time, reqId, tickType, price, size)
+        self._n += 1
+        if self._n == self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        """
+        Finish the current chunk and start a new one.
+        """
+        if not self._n:
+            return
+        data = memoryview(self._buf)[:self._n * _record.size]
+        if self._file:
+            self._file.write(data)
+            self._file.flush()
+        else:
+            self.chunks.append(bytes(data))
+        self.numTicks += self._n
+        self._n = 0
+
+    def close(self):
+        """
+        Flush the ticks and close the file.
+        """
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+            _logger.info(f'Captured {self.numTicks} ticks to {self.path}')
+
+    def view(self):
+        """
+        Return the ticks of the current chunk as NumPy structured array
+        with fields 'time', 'reqId', 'tickType', 'price' and 'size'.
+        This is a view on the buffer, without copying, that is only
+        valid until the chunk is finished.
+        """
+        import numpy as np
+        return np.frombuffer(self._buf, _dtype, self._n)
+
+    def array(self):
+        """
+        Return all ticks captured so far as one NumPy structured array.
+        """
+        import numpy as np
+        if self.path:
+            if self._file:
+                self._file.flush()
+            arrays = [np.fromfile(self.path, _dtype)]
+        else:
+            arrays = [np.frombuffer(chunk, _dtype) for chunk in self.chunks]
+        arrays.append(self.view())
+        return np.concatenate(arrays)
+
+    @staticmethod
+    def load(path):
+        """
+        Load the ticks from a capture file without copying, as a
+        read-only memory-mapped NumPy structured array with
+        fields 'time', 'reqId', 'tickType', 'price' and 'size'.
+        """
+        import numpy as np
+        return np.memmap(path, _dtype, 'r')
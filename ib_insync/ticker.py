@@ -1,6 +1,7 @@
 from eventkit import Event, Op
 
 from ib_insync.objects import Object, BarList
+from ib_insync.event import FastEvent
 from ib_insync.util import isNan
 
 __all__ = ['Ticker']
@@ -28,6 +29,9 @@ class Ticker(Object):
 
     Events:
         * ``updateEvent`` (ticker: :class:`.Ticker`)
+
+    The ``updateEvent`` is only emitted when it has listeners, so without
+    listeners its ``value()`` is not updated with the latest ticker.
     """
 
     events = ('updateEvent',)
@@ -134,7 +138,7 @@ class Ticker(Object):
         return price
 
 
-class TickerUpdateEvent(Event):
+class TickerUpdateEvent(FastEvent):
     __slots__ = ()
 
     def trades(self) -> "Tickfilter":
@@ -1,3 +1,4 @@
+import time
 import asyncio
 import logging
 import datetime
@@ -34,6 +35,7 @@ class Wrapper(EWrapper):
         self.ib = ib
         self._logger = logging.getLogger('ib_insync.wrapper')
         self._timeoutHandle = None
+        self._tickFlushHandle = None
         self.reset()
 
     def reset(self):
@@ -48,7 +50,13 @@ class Wrapper(EWrapper):
 
         self.tickers = {}  # id(Contract) -> Ticker
         self.pendingTickers = set()
+        if self._tickFlushHandle:
+            self._tickFlushHandle.cancel()
+            self._tickFlushHandle = None
         self.reqId2Ticker = {}
+        self.reqId2Capture = {}  # reqId -> TickCapture
+        self.reqId2OrderBook = {}  # reqId -> OrderBook
+        self.orderBooks = {}  # id(Contract) -> OrderBook
         self.ticker2ReqId = defaultdict(dict)  # tickType -> Ticker -> reqId
 
         self.reqId2Subscriber = {}  # live subscribers (live bars, scan data)
@@ -65,6 +73,7 @@ class Wrapper(EWrapper):
         self.accounts = []
         self.clientId = -1
         self.lastTime = None  # datetime (UTC) of last network packet arrival
+        self.lastEpoch = 0.0  # same as lastTime, in seconds since epoch
         self._timeout = 0
         self.setTimeout(0)
 
@@ -374,6 +383,12 @@ class Wrapper(EWrapper):
     def execDetails(self, reqId, contract, execution):
         """
         This wrapper handles both live fills and responses to reqExecutions.
+
+        Executions are merged by execId: A response to reqExecutions
+        for an execution that is already known returns the existing fill.
+
+        The contract and execution can be given as ibapi objects or,
+        as the client does, directly as ib_insync objects.
         """
         if execution.orderId == 2147483647:
             # bug in TWS: executions of manual orders have orderId=2**31 - 1
@@ -383,10 +398,11 @@ class Wrapper(EWrapper):
         trade = self.trades.get(key)
         if trade and contract.conId == trade.contract.conId:
             contract = trade.contract
-        else:
+        elif not isinstance(contract, Contract):
             contract = self._getContract(contract)
         execId = execution.execId
-        execution = Execution(**execution.__dict__)
+        if not isinstance(execution, Execution):
+            execution = Execution(**execution.__dict__)
         execution.time = util.parseIBDatetime(execution.time). \
             astimezone(datetime.timezone.utc)
         isLive = reqId not in self._futures
@@ -407,7 +423,7 @@ class Wrapper(EWrapper):
                     self.ib.execDetailsEvent.emit(trade, fill)
                     trade.fillEvent(trade, fill)
         if not isLive:
-            self._results[reqId].append(fill)
+            self._results[reqId].append(self.fills[execId])
 
     @iswrapper
     def execDetailsEnd(self, reqId):
@@ -559,6 +575,8 @@ class Wrapper(EWrapper):
             self._logger.error(f'priceSizeTick: Unknown reqId: {reqId}')
             return
         # https://interactivebrokers.github.io/tws-api/tick_types.html
+        # bid, ask and last are handled inline as the most frequent ones,
+        # the other tick types set a ticker field looked up by tickType
         if tickType in (1, 66):
             if price == ticker.bid and size == ticker.bidSize:
                 return
@@ -584,37 +602,17 @@ class Wrapper(EWrapper):
             if size != ticker.lastSize:
                 ticker.prevLastSize = ticker.lastSize
                 ticker.lastSize = size
-        elif tickType in (6, 72):
-            ticker.high = price
-        elif tickType in (7, 73):
-            ticker.low = price
-        elif tickType == 9:
-            ticker.close = price
-        elif tickType == 14:
-            ticker.open = price
-        elif tickType == 15:
-            ticker.low13week = price
-        elif tickType == 16:
-            ticker.high13week = price
-        elif tickType == 17:
-            ticker.low26week = price
-        elif tickType == 18:
-            ticker.high26week = price
-        elif tickType == 19:
-            ticker.low52week = price
-        elif tickType == 20:
-            ticker.high52week = price
-        elif tickType == 37:
-            ticker.markPrice = price
-        elif tickType == 50:
-            ticker.bidYield = price
-        elif tickType == 51:
-            ticker.askYield = price
-        elif tickType == 52:
-            ticker.lastYield = price
+        else:
+            setter = _priceTickSetters.get(tickType)
+            if setter:
+                setter(ticker, price)
         if price or size:
-            tick = TickData(self.lastTime, tickType, price, size)
-            ticker.ticks.append(tick)
+            capture = self.reqId2Capture.get(reqId)
+            if capture is not None:
+                capture.add(self.lastEpoch, reqId, tickType, price, size)
+            elif self.ib.KeepTicks:
+                tick = TickData(self.lastTime, tickType, price, size)
+                ticker.ticks.append(tick)
             self.pendingTickers.add(ticker)
 
     @iswrapper
@@ -625,6 +623,8 @@ class Wrapper(EWrapper):
             return
         price = -1.0
         # https://interactivebrokers.github.io/tws-api/tick_types.html
+        # bid, ask and last are handled inline as the most frequent ones,
+        # the other tick types set a ticker field looked up by tickType
         if tickType in (0, 69):
             if size == ticker.bidSize:
                 return
@@ -644,27 +644,17 @@ class Wrapper(EWrapper):
             if size != ticker.lastSize:
                 ticker.prevLastSize = ticker.lastSize
                 ticker.lastSize = size
-        elif tickType in (8, 74):
-            ticker.volume = size
-        elif tickType == 21:
-            ticker.avVolume = size
-        elif tickType == 27:
-            ticker.callOpenInterest = size
-        elif tickType == 28:
-            ticker.putOpenInterest = size
-        elif tickType == 29:
-            ticker.callVolume = size
-        elif tickType == 30:
-            ticker.putVolume = size
-        elif tickType == 86:
-            ticker.futuresOpenInterest = size
-        elif tickType == 87:
-            ticker.avOptionVolume = size
-        elif tickType == 89:
-            ticker.shortableShares = size
+        else:
+            setter = _sizeTickSetters.get(tickType)
+            if setter:
+                setter(ticker, size)
         if price or size:
-            tick = TickData(self.lastTime, tickType, price, size)
-            ticker.ticks.append(tick)
+            capture = self.reqId2Capture.get(reqId)
+            if capture is not None:
+                capture.add(self.lastEpoch, reqId, tickType, price, size)
+            elif self.ib.KeepTicks:
+                tick = TickData(self.lastTime, tickType, price, size)
+                ticker.ticks.append(tick)
             self.pendingTickers.add(ticker)
 
     @iswrapper
@@ -685,7 +675,9 @@ class Wrapper(EWrapper):
         if size != ticker.lastSize:
             ticker.prevLastSize = ticker.lastSize
             ticker.lastSize = size
-        attribs = TickAttribLast(**tickAttribLast.__dict__)
+        attribs = tickAttribLast
+        if not isinstance(attribs, TickAttribLast):
+            attribs = TickAttribLast(**attribs.__dict__)
         tick = TickByTickAllLast(
             tickType, self.lastTime, price, size, attribs,
             exchange, specialConditions)
@@ -712,7 +704,9 @@ class Wrapper(EWrapper):
         if askSize != ticker.askSize:
             ticker.prevAskSize = ticker.askSize
             ticker.askSize = askSize
-        attribs = TickAttribBidAsk(**tickAttribBidAsk.__dict__)
+        attribs = tickAttribBidAsk
+        if not isinstance(attribs, TickAttribBidAsk):
+            attribs = TickAttribBidAsk(**attribs.__dict__)
         tick = TickByTickBidAsk(
             self.lastTime, bidPrice, askPrice, bidSize, askSize, attribs)
         ticker.tickByTicks.append(tick)
@@ -765,8 +759,13 @@ class Wrapper(EWrapper):
                     if ticker.prevLastSize != ticker.lastSize:
                         ticker.prevLastSize = ticker.lastSize
                         ticker.lastSize = size
-                    tick = TickData(self.lastTime, tickType, price, size)
-                    ticker.ticks.append(tick)
+                    capture = self.reqId2Capture.get(reqId)
+                    if capture is not None:
+                        capture.add(
+                            self.lastEpoch, reqId, tickType, price, int(size))
+                    elif self.ib.KeepTicks:
+                        tick = TickData(self.lastTime, tickType, price, size)
+                        ticker.ticks.append(tick)
                     self.pendingTickers.add(ticker)
             elif tickType == 59:
                 # Dividend tick:
@@ -804,8 +803,12 @@ class Wrapper(EWrapper):
                 ticker.volumeRate = value
             elif tickType == 58:
                 ticker.rtHistVolatility = value
-            tick = TickData(self.lastTime, tickType, value, 0)
-            ticker.ticks.append(tick)
+            capture = self.reqId2Capture.get(reqId)
+            if capture is not None:
+                capture.add(self.lastEpoch, reqId, tickType, value, 0)
+            elif self.ib.KeepTicks:
+                tick = TickData(self.lastTime, tickType, value, 0)
+                ticker.ticks.append(tick)
             self.pendingTickers.add(ticker)
         except ValueError:
             self._logger.error(f'genericTick: malformed value: {value!r}')
@@ -834,6 +837,13 @@ class Wrapper(EWrapper):
         # side: 0 = ask, 1 = bid
         ticker = self.reqId2Ticker[reqId]
 
+        book = self.reqId2OrderBook.get(reqId)
+        if book is not None:
+            book.update(position, marketMaker, operation, side, price, size)
+            book.lastTime = self.lastTime
+            self.pendingTickers.add(ticker)
+            return
+
         dom = ticker.domBids if side else ticker.domAsks
         if operation == 0:
             dom.insert(position, DOMLevel(price, size, marketMaker))
@@ -1006,7 +1016,10 @@ class Wrapper(EWrapper):
             elif errorCode == 317:
                 # Market depth data has been RESET
                 ticker = self.reqId2Ticker.get(reqId)
-                if ticker:
+                book = self.reqId2OrderBook.get(reqId)
+                if book is not None:
+                    book.clear()
+                elif ticker:
                     for side, l in ((0, ticker.domAsks), (1, ticker.domBids)):
                         for position in reversed(l):
                             level = l.pop(position)
@@ -1018,7 +1031,12 @@ class Wrapper(EWrapper):
         self.ib.errorEvent.emit(reqId, errorCode, errorString, contract)
 
     def tcpDataArrived(self):
-        self.lastTime = datetime.datetime.now(datetime.timezone.utc)
+        self.lastEpoch = t = time.time()
+        self.lastTime = datetime.datetime.fromtimestamp(
+            t, datetime.timezone.utc)
+        if self._tickFlushHandle:
+            # coalescing: keep collecting ticks until the flush
+            return
         for ticker in self.pendingTickers:
             ticker.ticks = []
             ticker.tickByTicks = []
@@ -1028,7 +1046,46 @@ class Wrapper(EWrapper):
     def tcpDataProcessed(self):
         self.ib.updateEvent.emit()
         if self.pendingTickers:
-            for ticker in self.pendingTickers:
-                ticker.time = self.lastTime
+            coalesceTime = self.ib.TickCoalesceTime
+            if not coalesceTime:
+                self._emitPendingTickers()
+            elif not self._tickFlushHandle:
+                loop = asyncio.get_event_loop()
+                self._tickFlushHandle = loop.call_later(
+                    coalesceTime / 1e6, self._flushPendingTickers)
+
+    def _flushPendingTickers(self):
+        self._tickFlushHandle = None
+        self._emitPendingTickers()
+
+    def _emitPendingTickers(self):
+        lastTime = self.lastTime
+        for ticker in self.pendingTickers:
+            ticker.time = lastTime
+            if len(ticker.updateEvent):
                 ticker.updateEvent.emit(ticker)
-            self.ib.pendingTickersEvent.emit(self.pendingTickers)
+        self.ib.pendingTickersEvent.emit(self.pendingTickers)
+
+
+# Setters of the ticker fields per tickType, see
+# https://interactivebrokers.github.io/tws-api/tick_types.html
+
+_priceTickSetters = {
+    tickType: getattr(Ticker, field).__set__
+    for tickType, field in (
+        (6, 'high'), (72, 'high'), (7, 'low'), (73, 'low'),
+        (9, 'close'), (14, 'open'),
+        (15, 'low13week'), (16, 'high13week'),
+        (17, 'low26week'), (18, 'high26week'),
+        (19, 'low52week'), (20, 'high52week'),
+        (37, 'markPrice'),
+        (50, 'bidYield'), (51, 'askYield'), (52, 'lastYield'))}
+
+_sizeTickSetters = {
+    tickType: getattr(Ticker, field).__set__
+    for tickType, field in (
+        (8, 'volume'), (74, 'volume'), (21, 'avVolume'),
+        (27, 'callOpenInterest'), (28, 'putOpenInterest'),
+        (29, 'callVolume'), (30, 'putVolume'),
+        (86, 'futuresOpenInterest'), (87, 'avOptionVolume'),
+        (89, 'shortableShares'))}